@@ -1,20 +1,31 @@
 import sys
-import antstride
-import central
-import peripheral
-import struct
-import time
 
-from contextlib import redirect_stdout, redirect_stderr
+from startup_profile import ImportProfiler, startup_report
 
-from PySide6 import QtWidgets, QtGui
-from PySide6.QtCore import Qt
-from PySide6.QtWidgets import QSizePolicy, QStyleFactory, QTextEdit
-from PySide6.QtBluetooth import (QBluetoothAddress,
-                                 QBluetoothLocalDevice)
+# installed before anything heavy is imported, so --profile-startup sees every module
+profiler = ImportProfiler.from_argv(sys.argv)
+
+import argparse  # noqa: E402
+import time  # noqa: E402
+
+from data_view import DataViewModel, INITIAL  # noqa: E402
+from event_bus import EventBus  # noqa: E402
+from ftms_data import decode_treadmill_data, encode_treadmill_data, TreadmillData  # noqa: E402
+from log_model import LogModel  # noqa: E402
+from sample_pipeline import build_pipeline  # noqa: E402
+from supervisor import ConnectionSupervisor, BACKOFF, CONNECTED, FAILED  # noqa: E402
+from tracing import Tracer, GUI  # noqa: E402
+
+from PySide6 import QtWidgets, QtGui  # noqa: E402
+from PySide6.QtCore import Qt, QTimer  # noqa: E402
+from PySide6.QtWidgets import QSizePolicy, QStyleFactory, QPlainTextEdit  # noqa: E402
+
+# QtBluetooth, openant and the links (central, peripheral, antstride, ...) are imported where they are
+# first used, so the window shows before they load.
 
 
 def get_adapters():
+    from PySide6.QtBluetooth import QBluetoothLocalDevice
     test = QBluetoothLocalDevice.allDevices()
     devices = []
     for i in test:
@@ -23,7 +34,9 @@ def get_adapters():
 
 
 class TreadmillGUI(QtWidgets.QWidget):
-    def __init__(self):
+    def __init__(self, recorder=None, simulate=None, fake_ant_node=False, tracer=None, startup_profiler=None,
+                 known_devices=None, all_adapters=False, log=None, display_rate=4.0, fanout=False, ant_fec=False,
+                 workout=None, pipeline=None, charts=True):
         super().__init__()
 
         self.setWindowTitle("Treadmill Controller")
@@ -34,15 +47,54 @@ class TreadmillGUI(QtWidgets.QWidget):
         self.setLayout(self.layout)
 
         self.thread = {}
+        self.recorder = recorder
+        self.simulate = simulate  # notification rate of the simulated treadmill, None = Bluetooth
+        self.fake_ant_node = fake_ant_node
+        self.ant_fec = ant_fec  # FE-C treadmill channel next to the stride sensor
+        self.tracer = tracer  # latency tracing, None = off
+        self.startup_profiler = startup_profiler  # import profiler until the first link starts, None = off
+        self.report_first_notification = startup_profiler is not None
+        self.known_devices = known_devices  # device_cache.KnownDeviceCache, None = always scan
+        self.all_adapters = all_adapters  # discover on every adapter and let the best RSSI pick the roles
+        self.discovery = None
+        self.found_device = None  # QBluetoothDeviceInfo of the treadmill the adapter discovery found
+        self.fanout = fanout  # a peripheral on every adapter but the treadmill's
+        # output pane: bounded model, flushed to the widget in batches
+        self.log = log if log is not None else LogModel()
+        self.log_timer = QTimer(self)
+        self.log_timer.setSingleShot(True)
+        self.log_timer.setInterval(200)
+        self.log_timer.timeout.connect(self.flush_output)
+        self.replay = None
+        self.workout = workout  # workout.load_workout segments, run once the treadmill is connected
+        self.executor = None
+
+        # Every link publishes on the bus, the GUI subscribes once.
+        self.bus = EventBus(self)
+        self.bus.treadmill_data.connect(self.ftms_td)
+        self.bus.status.connect(self.ftms_st)
+        self.bus.training_status.connect(self.ftms_ts)
+        self.bus.control_point.connect(self.control_point)
+        self.bus.log.connect(self.received_output)
+
+        # Links are (re)started by their supervisors, with backoff instead of sleeping in the GUI.
+        self.supervisor = ConnectionSupervisor(self.bus, parent=self)
+        self.central_link = self.supervisor.add("central", self.start_central, self.stop_central, max_retries=3)
+        self.peripheral_link = self.supervisor.add("peripheral", self.start_peripheral, self.stop_peripheral)
+        self.ant_link = self.supervisor.add("ant", self.start_ant, self.stop_ant, max_retries=5)
+        self.supervisor.state_changed.connect(self.link_state)
 
         # Variables for treadmill data
         self.speed = 0.0
-        self.pace = "00:00"
-        self.distance = 0.000
-        self.time_elapsed = "00:00:00"
         self.incline = 0.0
-        self.calories = 0
-        self.values = []
+        self.values = TreadmillData()  # as the treadmill reports it, the control buttons work from it
+        # calibrated, filtered and clamped copy for the ANT+ feed, the BLE peripheral and the display
+        self.pipeline = pipeline if pipeline is not None else build_pipeline()
+        # labels repaint at most display_rate times/s and only when their text changed
+        self.view = DataViewModel(max_rate=display_rate)
+        self.paint_timer = QTimer(self)
+        self.paint_timer.setSingleShot(True)
+        self.paint_timer.timeout.connect(self.paint_data)
         self.treadmill_dongle = None
         self.peripheral_dongle = None
         self.ftms_connected = False
@@ -66,20 +118,76 @@ class TreadmillGUI(QtWidgets.QWidget):
         self.running = False
         self.create_output()
 
+        # Session charts over fixed-size multi-resolution series, None without NumPy or with charts off
+        self.series = None
+        self.series_start = None
+        self.charts = []
+        if charts:
+            self.create_charts()
+
+        # enumerating adapters loads QtBluetooth and talks to bluez, do it once the window is up
+        self.connect_btn.setDisabled(True)
+        QTimer.singleShot(0, self.load_adapters)
+
     def create_output(self):
         output_group = QtWidgets.QGroupBox("Output")
         output_layout = QtWidgets.QGridLayout()
         output_group.setLayout(output_layout)
         output_group.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
-        self.output_text = QTextEdit()
+        self.output_text = QPlainTextEdit()
         self.output_text.setReadOnly(True)
         self.output_text.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.output_text.setLineWrapMode(QTextEdit.NoWrap)
+        self.output_text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.output_text.setMaximumBlockCount(self.log.max_lines)
         output_layout.addWidget(self.output_text, 0, 0, 4, 2)
+        if self.tracer is not None:
+            latency_btn = QtWidgets.QPushButton("Latency")
+            latency_btn.clicked.connect(lambda: self.write_output(self.tracer.dump()))
+            output_layout.addWidget(latency_btn, 4, 1, 1, 1)
         self.layout.addWidget(output_group, 5, 0, 5, 4)
 
+    def create_charts(self):
+        try:
+            from live_chart import LiveChart
+            from time_series import SessionSeries
+            self.series = SessionSeries()
+        except ImportError as e:
+            self.write_output(f"Charts off: {e}")
+            return
+        chart_group = QtWidgets.QGroupBox("Session")
+        chart_layout = QtWidgets.QVBoxLayout()
+        chart_group.setLayout(chart_layout)
+        self.charts = [LiveChart("Speed (km/h)"),
+                       LiveChart("Pace (min/km)", label=lambda value: f"{int(value)}:{int(value % 1 * 60):02d}",
+                                 invert=True),
+                       LiveChart("Incline (%)")]
+        for chart in self.charts:
+            chart_layout.addWidget(chart)
+        self.layout.addWidget(chart_group, 3, 0, 1, 4)
+        self.chart_timer = QTimer(self)
+        self.chart_timer.setInterval(1000)
+        self.chart_timer.timeout.connect(self.paint_charts)
+        self.chart_timer.start()
+
+    def paint_charts(self):
+        # the whole session, at most one bucket per pixel of chart width
+        from time_series import INCLINE, SPEED, pace
+        if not self.series.samples or not self.isVisible():
+            return
+        speed_chart, pace_chart, incline_chart = self.charts
+        t, low, high, mean = self.series.window(SPEED, points=speed_chart.points())
+        speed_chart.set_data(t, low, high, mean)
+        pace_chart.set_data(t, *pace(low, high, mean))
+        incline_chart.set_data(*self.series.window(INCLINE, points=incline_chart.points()))
+
     def write_output(self, text):
-        self.output_text.append(text)
+        if self.log.append(text):
+            self.log_timer.start()
+
+    def flush_output(self):
+        lines = self.log.take()
+        if lines:
+            self.output_text.appendPlainText("\n".join(lines))
 
     def create_connect_disconnect_buttons(self):  # connect and disconnect buttons
         connect_disconnect_group = QtWidgets.QGroupBox("Connect/Disconnect")
@@ -88,28 +196,31 @@ class TreadmillGUI(QtWidgets.QWidget):
         connect_disconnect_group.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
 
         connect_disconnect_layout.addWidget(QtWidgets.QLabel("Adapter for Treadmill:"), 0, 0, 1, 1, Qt.AlignRight)
-        adapter_combobox = QtWidgets.QComboBox()
-        adapters = get_adapters()
-        if len(adapters) > 1:
-            self.treadmill_dongle = adapters[0].address()
-            self.peripheral_dongle = adapters[1].address()
-        else:
-            self.treadmill_dongle = adapters[0].address()
-        for adapter in adapters:
-            adapter_combobox.addItem(adapter.address().toString() + " - " + adapter.name())
-        connect_disconnect_layout.addWidget(adapter_combobox, 0, 1, 1, 1)
+        self.adapter_combobox = QtWidgets.QComboBox()
+        connect_disconnect_layout.addWidget(self.adapter_combobox, 0, 1, 1, 1)
         self.connect_btn = QtWidgets.QPushButton("Connect")
         connect_disconnect_layout.addWidget(self.connect_btn, 0, 2, 1, 1)
         self.disconnect_btn = QtWidgets.QPushButton("Close")
         connect_disconnect_layout.addWidget(self.disconnect_btn, 0, 3, 1, 1)
 
-        adapter_combobox.currentIndexChanged.connect(self.set_treadmill_dongle)
-
         self.connect_btn.clicked.connect(self.connect_button)
         self.disconnect_btn.clicked.connect(self.disconnect_button)
 
         self.layout.addWidget(connect_disconnect_group, 0, 0, 1, 4)
 
+    def load_adapters(self):
+        adapters = get_adapters()
+        if len(adapters) > 1:
+            self.treadmill_dongle = adapters[0].address()
+            self.peripheral_dongle = adapters[1].address()
+        elif adapters:
+            self.treadmill_dongle = adapters[0].address()
+        for adapter in adapters:
+            self.adapter_combobox.addItem(adapter.address().toString() + " - " + adapter.name())
+        # connected after filling, addItem would select the first adapter through it
+        self.adapter_combobox.currentIndexChanged.connect(self.set_treadmill_dongle)
+        self.connect_btn.setEnabled(bool(adapters) or self.simulate is not None)
+
     def set_treadmill_dongle(self, index):
         if index == 0:
             self.treadmill_dongle = str(self.sender().currentText()).split(" - ")[0]
@@ -121,84 +232,177 @@ class TreadmillGUI(QtWidgets.QWidget):
     def connect_button(self):
         self.sender().setDisabled(True)
         self.disconnect_btn.setDisabled(True)
-        if self.peripheral_dongle is None:
-            self.thread[1] = central.BleCentral(local_device=QBluetoothAddress(self.treadmill_dongle))
+        if self.simulate is None and self.all_adapters and self.adapter_combobox.count() > 1:
+            from multi_discovery import ParallelDiscovery
+            adapters = [self.adapter_combobox.itemText(i).split(" - ")[0] for i in range(self.adapter_combobox.count())]
+            self.discovery = ParallelDiscovery(adapters, bus=self.bus, parent=self)
+            self.discovery.finished.connect(self.adapters_chosen)
+            self.discovery.start()
+        else:
+            self.connect_treadmill()
+
+    def adapters_chosen(self, treadmill, peripheral, device):
+        if treadmill:
+            self.found_device = device
+            self.treadmill_dongle = treadmill
+            self.peripheral_dongle = peripheral or None
+            self.adapter_combobox.blockSignals(True)
+            self.adapter_combobox.setCurrentIndex(self.adapter_combobox.findText(treadmill, Qt.MatchStartsWith))
+            self.adapter_combobox.blockSignals(False)
+        self.connect_treadmill()
+
+    def connect_treadmill(self):
+        # the treadmill the adapter discovery found, handed to the central once so it does not scan again
+        device, self.found_device = self.found_device, None
+        if self.simulate is not None:
+            import simulated_treadmill
+            self.thread[1] = simulated_treadmill.SimulatedTreadmill(bus=self.bus, data_rate=self.simulate,
+                                                                    tracer=self.tracer)
+        elif self.peripheral_dongle is None:
+            import central
+            from PySide6.QtBluetooth import QBluetoothAddress
+            self.thread[1] = central.BleCentral(local_device=QBluetoothAddress(self.treadmill_dongle), bus=self.bus,
+                                                recorder=self.recorder, tracer=self.tracer,
+                                                known_devices=self.known_devices, device=device)
         else:
-            self.thread[1] = central.BleCentral(local_device=QBluetoothAddress(self.treadmill_dongle),
+            import central
+            from PySide6.QtBluetooth import QBluetoothAddress
+            self.thread[1] = central.BleCentral(local_device=QBluetoothAddress(self.treadmill_dongle), bus=self.bus,
+                                                recorder=self.recorder, tracer=self.tracer,
+                                                known_devices=self.known_devices, device=device,
                                                 blacklist_address=QBluetoothAddress(self.peripheral_dongle))
 
+        self.end_import_profile()
+        self.central_link.start()
+        self.ant_link.start()
+
+    def start_central(self):
         self.thread[1].run()
-        self.thread[1].emitter.ftms_td_signal.connect(self.ftms_td)
-        self.thread[1].emitter.ftms_st_signal.connect(self.ftms_st)
-        self.thread[1].emitter.ftms_ts_signal.connect(self.ftms_ts)
-        self.thread[1].emitter.ftms_co_signal.connect(self.connected)
-        self.thread[1].emitter.central_output.connect(self.received_output)
 
-        if 2 not in self.thread:
-            self.thread[2] = antstride.AntSend()
-            self.thread[2].start()
-            self.thread[2].finished.connect(self.ant_died)
+    def stop_central(self):
+        self.thread[1].stop()
+
+    def start_ant(self):
+        import antstride
+        if self.fake_ant_node:
+            import fake_ant
+            node_factory = fake_ant.FakeNode
+        else:
+            node_factory = None  # openant
+        self.thread[2] = antstride.AntSend(bus=self.bus, node_factory=node_factory, tracer=self.tracer,
+                                           fitness_equipment=self.ant_fec)
+        self.thread[2].start()
+
+    def stop_ant(self):
+        self.thread[2].stop()
+
+    def start_replay(self, path, speed):
+        # feed a recorded session through the bus instead of a treadmill
+        from session_replay import SessionReplay
+        self.end_import_profile()
+        self.ant_link.start()
+        self.replay = SessionReplay(path, self.bus, speed=speed, tracer=self.tracer, parent=self)
+        self.replay.finished.connect(lambda: self.write_output(f"Replay finished: {self.replay.replayed} records"))
+        self.write_output(f"Replaying {path} at {speed}x" if speed > 0 else f"Replaying {path}")
+        self.replay.start_replay()
+
+    def end_import_profile(self):
+        # the profiler's import stack is not thread-safe: it has to go before a link starts a thread
+        if self.startup_profiler is not None:
+            self.startup_profiler.uninstall()
+            self.write_output(self.startup_profiler.report())
+            self.startup_profiler = None
 
     def received_output(self, data):
         self.write_output(data)
 
-    def ant_died(self):
-        if self.ftms_connected:
-            self.thread[2].stop()
-            self.write_output("Ant died... reconnect")
-            self.thread[2] = antstride.AntSend()
-            self.thread[2].start()
+    def link_state(self, link, state):
+        if link == "central":
+            self.connected(state)
+        elif link == "ant" and state == FAILED:
+            self.write_output("ANT+ failed... no stick?")
 
     def control_point(self, data):
         self.thread[1].update_ftms(data)
 
-    def connected(self, data):
-        if self.peripheral_dongle and 3 not in self.thread and data:
-            self.thread[3] = peripheral.FtmsPeripheral(local_device=QBluetoothAddress(self.peripheral_dongle))
+    def start_peripheral(self):
+        import peripheral
+        from PySide6.QtBluetooth import QBluetoothAddress
+        if self.fanout:
+            treadmill = QBluetoothAddress(self.treadmill_dongle)
+            adapters = [QBluetoothAddress(self.adapter_combobox.itemText(i).split(" - ")[0])
+                        for i in range(self.adapter_combobox.count())]
+            self.thread[3] = peripheral.PeripheralFanout([a for a in adapters if a != treadmill], bus=self.bus,
+                                                         recorder=self.recorder, tracer=self.tracer)
+            self.thread[3].run()
+            return
+        self.thread[3] = peripheral.FtmsPeripheral(local_device=QBluetoothAddress(self.peripheral_dongle),
+                                                   bus=self.bus, recorder=self.recorder, tracer=self.tracer)
+        self.thread[3].run()
+
+    def stop_peripheral(self):
+        self.thread.pop(3).stop()
 
-        if data and not self.ftms_connected:
+    def connected(self, state):
+        if state == CONNECTED and not self.ftms_connected:
             self.disconnect_btn.setDisabled(False)
             self.set_button_states(True)
             self.ftms_connected = True
-            if 3 in self.thread:
-                self.thread[3].run()
-                self.thread[3].emitter.control_point.connect(self.control_point)
-                self.thread[3].emitter.peripheral_output.connect(self.received_output)
-                self.thread[3].emitter.peripheral_co_signal.connect(self.peripheral_connected)
-        elif self.ftms_connected and not data:
+            if self.peripheral_dongle:
+                self.peripheral_link.start()
+            if self.workout and self.executor is None:
+                self.start_workout()
+        elif state == BACKOFF and self.ftms_connected:
             self.write_output("FTMS disconnected unintended... reconnect.")
-            self.thread[1].stop()
-            time.sleep(2)
-            self.thread[1].run()
-        elif not data and not self.ftms_connected:
-            self.thread[1].stop()
+        elif state == FAILED:
             self.connect_btn.setDisabled(False)
-            # self.disconnect_btn.setDisabled(True)
             self.set_button_states(False)
             self.ftms_connected = False
+            self.peripheral_link.stop()
             self.write_output("No FTMS connected... retry?")
 
-    def peripheral_connected(self, data):
-        if not data and self.ftms_connected:
-            self.write_output("Peripheral disconnected... rebuild peripheral.")
-            self.thread[3].stop()
-            time.sleep(1)
-            self.thread[3] = peripheral.FtmsPeripheral(local_device=QBluetoothAddress(self.peripheral_dongle))
-            self.thread[3].run()
-            self.thread[3].emitter.control_point.connect(self.control_point)
-            self.thread[3].emitter.peripheral_output.connect(self.received_output)
-            self.thread[3].emitter.peripheral_co_signal.connect(self.peripheral_connected)
-
-    def ftms_td(self, data):
+    def start_workout(self):
+        from workout import WorkoutExecutor
+        self.executor = WorkoutExecutor(self.workout,
+                                        lambda value, pace=None: self.thread[1].update_ftms(value, pace),
+                                        self.bus, parent=self)
+        self.executor.segment_started.connect(self.workout_segment)
+        self.executor.finished.connect(lambda: self.write_output("Workout finished\n" + self.executor.report()))
+        self.running = True
+        self.executor.start()
+
+    def workout_segment(self, index):
+        duration, distance, speed, incline = self.workout[index]
+        length = f"{duration:.0f} s" if duration is not None else f"{distance:.0f} m"
+        self.write_output(f"Workout segment {index + 1}/{len(self.workout)}: {length} at {speed} km/h, {incline} %")
+
+    def ftms_td(self, data, trace=None):
+        # trace: the one the sample arrived with, not the tracer's newest (samples coalesce or split)
+        if self.tracer is not None and trace is not None:
+            self.tracer.stamp(GUI, trace)
+        try:
+            decode_treadmill_data(data, self.values)
+        except ValueError as e:
+            self.write_output(str(e))
+            return
+        sample = self.pipeline.process(self.values)
         if 3 in self.thread:
-            self.thread[3].ftms_value = data
-        payload = data[2:]
-        fmt = '<HHBHHHHBBH'
-        self.values = list(struct.unpack(fmt, bytes(payload[0:struct.calcsize(fmt)])))
-        self.thread[2].treadmill_speed = self.values[0] / 360  # m/s
-        self.thread[2].treadmill_distance = self.values[1]
-        self.thread[2].calories = self.values[5]
-        self.update_data(self.values)
+            self.thread[3].ftms_value = encode_treadmill_data(sample)
+        if self.series is not None:
+            now = time.monotonic()
+            if self.series_start is None:
+                self.series_start = now
+            self.series.append(now - self.series_start, (sample.speed / 100, sample.inclination / 10))
+        if self.report_first_notification:
+            self.write_output(startup_report("first notification"))
+            self.report_first_notification = False
+        self.thread[2].update_state(sample.speed / 360,  # m/s
+                                    sample.total_distance,
+                                    sample.total_energy,
+                                    sample.inclination / 10,  # %
+                                    sample.heart_rate,
+                                    trace=trace)
+        self.update_data(sample)
 
     def ftms_st(self, data):
         if 3 in self.thread:
@@ -209,36 +413,24 @@ class TreadmillGUI(QtWidgets.QWidget):
             self.thread[3].training_status = data
 
     def update_data(self, data):
-        self.speed = data[0]/100
-        if data[0] != 0:
-            self.pace = str(int(6000/data[0])) + ":" + str(int((6000/data[0] - int(6000/data[0]))*60)).zfill(2)
-        else:
-            self.pace = "00:00"
-        self.distance = data[1]/1000
-        if data[9] < 60:
-            self.time_elapsed = "00:" + str(data[9]).zfill(2)
-        elif data[9] < 3600:
-            self.time_elapsed = str(data[9]//60).zfill(2) + ":" + str(data[9] % 60).zfill(2)
-        else:
-            self.time_elapsed = (str(data[9]//3600) + ":"
-                                 + str((data[9] % 3600)//60).zfill(2) + ":"
-                                 + str(data[9] % 60).zfill(2))
-        self.incline = data[3]/10
-        self.calories = data[5]
+        self.speed = data.speed/100
+        self.incline = data.inclination/10
+        self.view.update(data)
+        if not self.paint_timer.isActive():
+            self.paint_timer.start(self.view.delay())
 
-        for field, value in zip(self.data_fields, [str(self.speed), self.pace, str(self.distance), self.time_elapsed,
-                                                   str(self.incline), str(self.calories)]):
-            field.setText(str(value))
+    def paint_data(self):
+        for index, text in self.view.changes():
+            self.data_fields[index].setText(text)
 
     def disconnect_button(self):
         if self.disconnect_btn.text() == "Disconnect":
             self.ftms_connected = False
-            if 1 in self.thread:
-                self.thread[1].stop()
-
-            if 3 in self.thread:
-                self.thread[3].stop()
+            self.central_link.stop()
+            self.peripheral_link.stop()
 
+            self.write_output("Events: " + self.bus.stats())
+            self.write_output(self.supervisor.report())
             print("set button")
             self.set_button_states(False)
             print("set connect_btn")
@@ -246,7 +438,11 @@ class TreadmillGUI(QtWidgets.QWidget):
         else:
             self.write_output("shutting down ...")
             self.stop()
-            self.close()
+            if 1 in self.thread and self.thread[1].commands.pending():
+                # close once the stop commands are written
+                self.thread[1].commands.drained.connect(self.close)
+            else:
+                self.close()
 
     def create_data_display(self):
         data_group = QtWidgets.QGroupBox("Treadmill Data")
@@ -256,8 +452,7 @@ class TreadmillGUI(QtWidgets.QWidget):
 
         data_labels = ["Speed (km/h):", "Pace (min/km):", "Distance (km):", "Time Elapsed:", "Incline (%):",
                        "Calories Burned:"]
-        data_values = [str(self.speed), self.pace, str(self.distance), self.time_elapsed, str(self.incline),
-                       str(self.calories)]
+        data_values = INITIAL
 
         self.data_fields = []
 
@@ -378,23 +573,23 @@ class TreadmillGUI(QtWidgets.QWidget):
         self.thread[1].update_ftms(incline_bytes)
 
     def increase_speed(self):
-        speed = self.values[0] + 20
+        speed = self.values.speed + 20
         speed_bytes = bytearray([0x02]) + int(speed).to_bytes(2, byteorder='little')
         self.thread[1].update_ftms(speed_bytes)
 
     def decrease_speed(self):
-        speed = self.values[0] - 20
+        speed = self.values.speed - 20
         speed_bytes = bytearray([0x02]) + int(speed).to_bytes(2, byteorder='little')
         self.thread[1].update_ftms(speed_bytes)
 
     def increase_incline(self):
-        incline = self.values[3] + 5
-        incline_bytes = bytearray([0x03]) + int(incline).to_bytes(2, byteorder='little')
+        incline = self.values.inclination + 5
+        incline_bytes = bytearray([0x03]) + int(incline).to_bytes(2, byteorder='little', signed=True)
         self.thread[1].update_ftms(incline_bytes)
 
     def decrease_incline(self):
-        incline = self.values[3] - 5
-        incline_bytes = bytearray([0x03]) + int(incline).to_bytes(2, byteorder='little')
+        incline = self.values.inclination - 5
+        incline_bytes = bytearray([0x03]) + int(incline).to_bytes(2, byteorder='little', signed=True)
         self.thread[1].update_ftms(incline_bytes)
 
     def start_pause(self):
@@ -407,28 +602,129 @@ class TreadmillGUI(QtWidgets.QWidget):
 
     def stop(self):
         if 1 in self.thread:
-            self.thread[1].update_ftms(bytearray([0x08, 0x02]))
-            time.sleep(0.25)
-            self.thread[1].update_ftms(bytearray([0x00]))
-            time.sleep(0.25)
-            self.thread[1].update_ftms(bytearray([0x01]))
-            time.sleep(0.25)
+            self.thread[1].update_ftms(bytearray([0x08, 0x02]), pace=250)
+            self.thread[1].update_ftms(bytearray([0x00]), pace=250)
+            self.thread[1].update_ftms(bytearray([0x01]), pace=250)
             self.thread[1].update_ftms(bytearray([0x00]))
         self.running = False
 
     def closeEvent(self, event):
         self.ftms_connected = False
         print("Closing...")
-        for i in self.thread:
-            self.thread[i].stop()
-            print(f"Thread {i} stopped.")
+        self.supervisor.stop()
+        print(self.supervisor.report())
+        if self.executor is not None:
+            self.executor.stop()
+            print(self.executor.report())
+        print("Samples: " + self.pipeline.report())
+        print("Log: " + ", ".join(f"{key} {value}" for key, value in self.log.counters().items()))
+        if self.replay is not None:
+            self.replay.stop()
+        if self.discovery is not None:
+            self.discovery.stop()
+        if self.recorder is not None:
+            self.recorder.close()
         time.sleep(0.5)
         app.quit()
 
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="BLE Bridge - connect a FTMS treadmill with ANT+ and BLE devices")
+    parser.add_argument("--record", metavar="FILE",
+                        help="append raw notifications and control point writes to a session log")
+    parser.add_argument("--replay", metavar="FILE", help="replay a session log instead of a treadmill")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="replay speed factor, 0 = as fast as possible (default 1)")
+    parser.add_argument("--fake-ant", action="store_true",
+                        help="run the ANT+ channel on an in-process fake node instead of a USB stick")
+    parser.add_argument("--ant-fec", action="store_true",
+                        help="also broadcast an ANT+ FE-C treadmill channel (speed, incline, elapsed time, state)")
+    parser.add_argument("--speed-factor", metavar="F", type=float, default=1.0,
+                        help="belt calibration: multiply the treadmill's speed by F (default 1)")
+    parser.add_argument("--distance-factor", metavar="F", type=float, default=1.0,
+                        help="belt calibration: multiply the treadmill's distance by F (default 1)")
+    parser.add_argument("--spike-limit", metavar="KMH", type=float, default=3.0,
+                        help="hold speed jumps above KMH per sample until confirmed, 0 = off (default 3)")
+    parser.add_argument("--smoothing", metavar="N", type=int, default=0,
+                        help="average the speed over the last N samples (default off)")
+    parser.add_argument("--no-charts", action="store_true",
+                        help="do not show the session charts (they need numpy)")
+    parser.add_argument("--workout", metavar="FILE",
+                        help="run the JSON segment list in FILE once the treadmill is connected")
+    parser.add_argument("--trace", action="store_true",
+                        help="trace latency from FTMS notification to ANT+ broadcast and BLE re-notification")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="print startup time and memory once the window is shown, then exit")
+    parser.add_argument("--device-cache", metavar="FILE", default=None,
+                        help="remember the last treadmill in FILE to reconnect without scanning "
+                             "(default ~/.ble_bridge_devices.json, '' = always scan)")
+    parser.add_argument("--all-adapters", action="store_true",
+                        help="discover on all adapters, the one hearing the treadmill best connects to it")
+    parser.add_argument("--log-file", metavar="FILE",
+                        help="keep the full output in FILE, rotated at 1 MB with 5 backups")
+    parser.add_argument("--log-lines", metavar="N", type=int, default=1000,
+                        help="lines kept in the output pane (default 1000)")
+    parser.add_argument("--fanout", action="store_true",
+                        help="run the BLE peripheral on every adapter but the treadmill's, one client each")
+    parser.add_argument("--display-rate", metavar="HZ", type=float, default=4.0,
+                        help="repaint the treadmill data at most HZ times/s, 0 = on every notification (default 4)")
+    parser.add_argument("--qt-bluetooth-log", action="store_true",
+                        help="enable Qt's qt.bluetooth debug logging")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the slowest imports when the window is shown and on the first notification")
+    parser.add_argument("--simulate", metavar="RATE", type=float, nargs="?", const=1.0,
+                        help="use a simulated treadmill sending RATE notifications/s (default 1)")
+    # everything else is left to Qt
+    return parser.parse_known_args(argv[1:])
+
+
 if __name__ == "__main__":
-    app = QtWidgets.QApplication(sys.argv)
+    options, qt_args = parse_args(sys.argv)
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
     app.setStyle(QStyleFactory.create("Fusion"))
-    window = TreadmillGUI()
+    recorder = None
+    if options.record:
+        from session_log import SessionRecorder
+        recorder = SessionRecorder(options.record)
+    known_devices = None
+    if options.device_cache != "":
+        from device_cache import DEFAULT_PATH, KnownDeviceCache
+        known_devices = KnownDeviceCache(options.device_cache or DEFAULT_PATH)
+    if options.qt_bluetooth_log:
+        from PySide6.QtCore import QLoggingCategory
+        QLoggingCategory.setFilterRules("qt.bluetooth* = true")
+    log_sink = None
+    if options.log_file:
+        from log_model import rotating_file_logger
+        log_sink = rotating_file_logger(options.log_file)
+    segments = None
+    if options.workout:
+        from workout import load_workout
+        try:
+            segments = load_workout(options.workout)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Cannot load workout: {e}")
+    window = TreadmillGUI(recorder=recorder, simulate=options.simulate, fake_ant_node=options.fake_ant,
+                          tracer=Tracer() if options.trace else None, startup_profiler=profiler,
+                          known_devices=known_devices, all_adapters=options.all_adapters,
+                          log=LogModel(max_lines=options.log_lines, sink=log_sink),
+                          display_rate=options.display_rate, fanout=options.fanout,
+                          ant_fec=options.ant_fec, workout=segments,
+                          pipeline=build_pipeline(options.speed_factor, options.distance_factor,
+                                                  options.spike_limit, options.smoothing),
+                          charts=not options.no_charts)
     window.show()
+    if options.replay:
+        window.start_replay(options.replay, options.replay_speed)
+
+    def started():
+        report = startup_report("GUI")
+        print(report)
+        window.write_output(report)
+        if profiler is not None:
+            print(profiler.report())
+        if options.exit_after_startup:
+            window.end_import_profile()
+            app.quit()
+    QTimer.singleShot(0, started)
     app.exec()
@@ -0,0 +1,199 @@
+# ANT+ Stride & Distance data pages
+# Page rotation per 132 messages: common page 80 twice, common page 81 twice, page 1 otherwise.
+ROTATION_LENGTH = 132
+PAGE_SCHEDULE = tuple(80 if count < 3 else 81 if 66 < count < 69 else 1
+                      for count in range(1, ROTATION_LENGTH + 1))
+
+PAGE_80 = (80, 0xFF, 0xFF, 1, 1, 1, 1, 1)  # Reserved, HW Revision, Manufacturer ID, Model Number
+PAGE_81 = (81, 0xFF, 0xFF, 1, 0xFF, 0xFF, 0xFF, 0xFF)  # Reserved, SW Revision, Serial Number
+
+NS = 1_000_000_000
+TIME_TICK_NS = NS // 200  # page 1 time resolution, 1/200 s
+LATENCY_TICK_NS = NS // 32  # update latency, 1/32 s
+TIME_WRAP_NS = 256 * NS
+DISTANCE_UNITS = 16  # page 1 distance resolution, 1/16 m
+SPEED_UNITS = 256  # page 1 speed resolution, 1/256 m/s
+
+
+class StridePageEngine:
+    """Builds the next stride page on every TX event.
+
+    The rotation is a precomputed schedule, the payload is written into one reused buffer and the
+    treadmill state is read from a single (speed m/s, distance m, calories, ...) snapshot, so every
+    tick costs the same no matter how long the session runs. `now` is a monotonic clock in integer ns.
+
+    All accumulators are integers in the units of the page (time in ns, shown in 1/200 s, distance
+    in 1/16 m, whole strides and kcal) and wrap exactly at 256 of the page unit, so a receiver
+    summing the deltas never sees drift. Distance or calories going backwards (treadmill reset,
+    reconnect) add nothing instead of jumping.
+    """
+
+    def __init__(self, cadence=160):
+        self.buffer = [0] * 8
+        self.tick = 0
+        self.last_time = None
+
+        self.stride_ns = 60 * NS * 2 // cadence  # one stride every two footfalls
+        self.stride_phase = 0  # ns into the running stride
+        self.strides = 0  # mod 256
+        self.time_ns = 0  # mod 256 s
+        self.distance_in = None  # last snapshot distance, 1/16 m
+        self.distance = 0  # 1/16 m, mod 256 m
+        self.calories_in = None
+        self.calories = 0  # mod 256
+
+    def set_cadence(self, cadence):
+        self.stride_ns = 60 * NS * 2 // cadence
+
+    def next_page(self, now, snapshot):
+        speed = snapshot[0]
+        if self.last_time is None:
+            self.last_time = now
+        elapsed = now - self.last_time
+        self.last_time = now
+
+        distance = int(snapshot[1] * DISTANCE_UNITS)
+        moved = 0
+        if self.distance_in is not None and distance > self.distance_in:
+            moved = distance - self.distance_in
+            self.distance = (self.distance + moved) & 0xFFF
+        self.distance_in = distance
+
+        calories = snapshot[2]
+        if self.calories_in is not None and calories > self.calories_in:
+            self.calories = (self.calories + calories - self.calories_in) & 0xFF
+        self.calories_in = calories
+
+        # Time and strides only advance while moving (see specification)
+        if speed > 0 or moved:
+            time_ns = self.time_ns + elapsed
+            self.time_ns = time_ns if time_ns < TIME_WRAP_NS else time_ns % TIME_WRAP_NS
+            phase = self.stride_phase + elapsed
+            if phase >= self.stride_ns:
+                self.strides = (self.strides + phase // self.stride_ns) & 0xFF
+                phase %= self.stride_ns
+            self.stride_phase = phase
+
+        page = PAGE_SCHEDULE[self.tick]
+        self.tick += 1
+        if self.tick == ROTATION_LENGTH:
+            self.tick = 0
+
+        buffer = self.buffer
+        if page == 80:
+            buffer[:] = PAGE_80
+        elif page == 81:
+            buffer[:] = PAGE_81
+        else:
+            time_ticks = self.time_ns // TIME_TICK_NS
+            speed_units = int(speed * SPEED_UNITS)
+            if speed_units > 0xFFF:
+                speed_units = 0xFFF
+            buffer[0] = 0x01  # Data Page 1
+            buffer[1] = time_ticks % 200  # Time fractional, 1/200 s
+            buffer[2] = time_ticks // 200  # Time integer, s
+            buffer[3] = self.distance >> 4  # Distance accumulated, integer
+            buffer[4] = (self.distance & 0xF) << 4 | speed_units >> 8  # Distance fractional & speed integer
+            buffer[5] = speed_units & 0xFF  # Instantaneous speed, fractional
+            buffer[6] = self.strides  # Stride count - required
+            latency = elapsed // LATENCY_TICK_NS
+            buffer[7] = latency if latency < 256 else 255  # Update latency
+        return buffer
+
+
+# ANT+ Fitness Equipment (FE-C) treadmill data pages
+# General FE data (16) every other message, specific treadmill data (19) and general settings (17, incline)
+# in between, common pages 80 and 81 twice per 132 messages.
+FE_ROTATION = (16, 19, 16, 17)
+FE_SCHEDULE = tuple(80 if count in (65, 66) else 81 if count in (131, 132) else FE_ROTATION[count % 4]
+                    for count in range(1, ROTATION_LENGTH + 1))
+
+FE_TREADMILL = 19  # equipment type, also the number of its specific data page
+FE_READY = 2  # FE state
+FE_IN_USE = 3
+FE_DISTANCE_ENABLED = 0x04  # page 16 capabilities
+FE_HR_HAND_CONTACT = 0x03
+FE_VERTICAL_DISTANCE = 0x03  # page 19 capabilities: negative and positive vertical distance
+
+
+class FitnessEquipmentPageEngine:
+    """Builds the next FE-C treadmill page on every TX event, like StridePageEngine.
+
+    Reads the (speed m/s, distance m, calories, incline %, heart rate) snapshot, `now` in ns.
+    Elapsed time runs while the belt moves, vertical distance accumulates from distance and incline.
+    """
+
+    def __init__(self, cadence=160):
+        self.buffer = [0] * 8
+        self.tick = 0
+        self.last_time = None
+        self.strides_per_minute = cadence // 2
+        self.elapsed = 0  # ns in use
+        self.distance_last = None
+        self.climb = 0.0  # m
+        self.descent = 0.0  # m
+
+    def set_cadence(self, cadence):
+        self.strides_per_minute = cadence // 2
+
+    def next_page(self, now, snapshot):
+        speed = snapshot[0]
+        distance = snapshot[1]
+        incline = snapshot[3]
+        if self.last_time is None:
+            self.last_time = now
+        in_use = speed > 0
+        if in_use:
+            self.elapsed = (self.elapsed + now - self.last_time) % (64 * NS)
+        self.last_time = now
+        if self.distance_last is not None and distance > self.distance_last:
+            vertical = (distance - self.distance_last) * incline / 100
+            if vertical > 0:
+                self.climb += vertical
+            else:
+                self.descent -= vertical
+        self.distance_last = distance
+        state = (FE_IN_USE if in_use else FE_READY) << 4
+
+        page = FE_SCHEDULE[self.tick]
+        self.tick += 1
+        if self.tick == ROTATION_LENGTH:
+            self.tick = 0
+
+        buffer = self.buffer
+        if page == 16:
+            heart_rate = snapshot[4]
+            speed_mm = int(speed * 1000)
+            speed_mm = speed_mm if speed_mm < 0xFFFF else 0xFFFE
+            buffer[0] = 16  # General FE Data
+            buffer[1] = FE_TREADMILL
+            buffer[2] = self.elapsed * 4 // NS & 0xFF  # Elapsed time, 0.25 s, rollover 64 s
+            buffer[3] = int(distance) & 0xFF  # Distance traveled, m, rollover 256 m
+            buffer[4] = speed_mm & 0xFF  # Speed, 0.001 m/s
+            buffer[5] = speed_mm >> 8
+            buffer[6] = heart_rate if 0 < heart_rate < 0xFF else 0xFF  # Heart rate, 0xFF = invalid
+            buffer[7] = (FE_DISTANCE_ENABLED | (FE_HR_HAND_CONTACT if 0 < heart_rate < 0xFF else 0)) | state
+        elif page == 17:
+            incline_hundredths = int(incline * 100) & 0xFFFF  # signed, 0.01 %
+            buffer[0] = 17  # General Settings
+            buffer[1] = 0xFF  # Reserved
+            buffer[2] = 0xFF
+            buffer[3] = 0xFF  # Cycle length, invalid
+            buffer[4] = incline_hundredths & 0xFF  # Incline
+            buffer[5] = incline_hundredths >> 8
+            buffer[6] = 0xFF  # Resistance level, invalid
+            buffer[7] = state
+        elif page == 19:
+            buffer[0] = 19  # Specific Treadmill Data
+            buffer[1] = 0xFF  # Reserved
+            buffer[2] = 0xFF
+            buffer[3] = 0xFF
+            buffer[4] = self.strides_per_minute if in_use else 0  # Cadence, strides/min
+            buffer[5] = int(self.descent * 10) & 0xFF  # Negative vertical distance, 0.1 m
+            buffer[6] = int(self.climb * 10) & 0xFF  # Positive vertical distance, 0.1 m
+            buffer[7] = FE_VERTICAL_DISTANCE | state
+        elif page == 80:
+            buffer[:] = PAGE_80
+        else:
+            buffer[:] = PAGE_81
+        return buffer
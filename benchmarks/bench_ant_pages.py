@@ -0,0 +1,272 @@
+"""Per-tick cost of the ANT+ stride page creation over long simulated sessions.
+
+Runs the ~4 Hz stride channel (period 8134) against a simulated clock and compares the former
+AntSend.create_next_datapage, the float StridePageEngine that replaced it and the integer
+ant_pages.StridePageEngine. Mean and worst tick cost per hour of session show whether the cost
+stays flat.
+Run from the repository root: python benchmarks/bench_ant_pages.py [hours]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ant_pages import NS, PAGE_80, PAGE_81, PAGE_SCHEDULE, ROTATION_LENGTH, StridePageEngine  # noqa: E402
+
+CHANNEL_PERIOD = 8134
+TICK = CHANNEL_PERIOD / 32768  # s
+TICK_NS = CHANNEL_PERIOD * NS // 32768
+TICKS_PER_HOUR = int(3600 / TICK)
+SPEED = 10.5 / 3.6  # m/s
+LATENCY_UNIT = 1 / 32  # s
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class LegacyPages:
+    # AntSend.create_next_datapage before the page engine, with time.time() replaced by the clock
+    def __init__(self, clock):
+        self.clock = clock
+        self.ant_message_count = 0
+        self.last_stride_time = 0
+        self.strides_done = 0
+        self.distance_accu = 0
+        self.distance_last = 0
+        self.speed_last = 0
+        self.time_rollover = 0
+        self.treadmill_distance_old = 0
+        self.treadmill_speed = 0
+        self.treadmill_cadence = 160
+        self.treadmill_distance = 0
+        self.calories = 0
+        self.calories_last = 0
+        self.calories_total = 0
+        self.last_time_event = clock.time()
+
+    def create_next_datapage(self):
+        update_latency = 0
+        self.ant_message_count += 1
+        elapsed_seconds = self.clock.time() - self.last_time_event
+        self.last_time_event = self.clock.time()
+        update_latency += elapsed_seconds
+        update_latency = int(update_latency / 0.03125)
+        stride_count_up_value = 60.0 / (self.treadmill_cadence / 2.0)
+        while self.last_stride_time > stride_count_up_value:
+            self.strides_done += 1
+            self.last_stride_time -= stride_count_up_value
+        self.last_stride_time += elapsed_seconds
+        if self.strides_done > 255:
+            self.strides_done -= 255
+            if self.strides_done > 255:
+                self.strides_done = 1
+        calories_delta = self.calories - self.calories_last
+        self.calories_last = self.calories
+        self.calories_total += calories_delta
+        if self.calories_total > 255:
+            self.calories_total -= 255
+            if self.calories_total > 255:
+                self.calories_total = 1
+        distance_delta = self.treadmill_distance - self.treadmill_distance_old
+        self.treadmill_distance_old = self.treadmill_distance
+        self.distance_accu += distance_delta
+        if self.distance_accu > 255:
+            self.distance_accu -= 255
+            if self.distance_accu > 255:
+                self.distance_accu = 1
+        distance_h = int(self.distance_accu)
+        distance_low_hex = int((self.distance_accu - distance_h) * 16)
+        var_speed_ms_h = int(self.treadmill_speed)
+        var_speed_ms_l_hex = int((self.treadmill_speed - var_speed_ms_h) * 256)
+        if self.speed_last != self.treadmill_speed or self.distance_last != self.distance_accu:
+            self.time_rollover += elapsed_seconds
+            if self.time_rollover > 255:
+                self.time_rollover -= 255
+                if self.time_rollover > 255:
+                    self.time_rollover = 1
+        time_rollover_h = int(self.time_rollover)
+        if time_rollover_h > 255:
+            time_rollover_h = 255
+        time_rollover_l_hex = int((self.time_rollover - time_rollover_h) * 200)
+        if time_rollover_l_hex > 255:
+            time_rollover_l_hex -= 255
+        self.speed_last = self.treadmill_speed
+        self.distance_last = self.distance_accu
+        payload = [0, 0, 0, 0, 0, 0, 0, 0]
+        if self.ant_message_count < 3:
+            payload[:] = [80, 0xFF, 0xFF, 1, 1, 1, 1, 1]
+        elif 66 < self.ant_message_count < 69:
+            payload[:] = [81, 0xFF, 0xFF, 1, 0xFF, 0xFF, 0xFF, 0xFF]
+        else:
+            payload[0] = 0x01
+            payload[1] = time_rollover_l_hex
+            payload[2] = time_rollover_h
+            payload[3] = distance_h
+            payload[4] = distance_low_hex * 16 + var_speed_ms_h
+            payload[5] = var_speed_ms_l_hex
+            payload[6] = self.strides_done
+            payload[7] = update_latency
+        if self.ant_message_count > 131:
+            self.ant_message_count = 0
+        return payload
+
+
+class FloatStrideEngine:
+    # ant_pages.StridePageEngine before the integer accumulators, `now` in s
+
+    def __init__(self, cadence=160):
+        self.buffer = [0] * 8
+        self.tick = 0
+        self.last_time = None
+
+        self.stride_interval = 60.0 / (cadence / 2.0)  # one stride every two footfalls
+        self.last_stride_time = 0
+        self.strides_done = 0
+        self.distance_old = 0
+        self.distance_accu = 0
+        self.distance_last = 0
+        self.speed_last = 0
+        self.time_rollover = 0
+        self.calories_last = 0
+        self.calories_total = 0
+
+    def set_cadence(self, cadence):
+        self.stride_interval = 60.0 / (cadence / 2.0)
+
+    def next_page(self, now, snapshot):
+        speed = snapshot[0]
+        distance = snapshot[1]
+        calories = snapshot[2]
+        if self.last_time is None:
+            self.last_time = now
+        elapsed = now - self.last_time
+        self.last_time = now
+
+        # Stride count, accumulated strides
+        while self.last_stride_time > self.stride_interval:
+            self.strides_done += 1
+            self.last_stride_time -= self.stride_interval
+        self.last_stride_time += elapsed
+        if self.strides_done > 255:
+            self.strides_done -= 255
+            if self.strides_done > 255:  # after reconnect
+                self.strides_done = 1
+
+        self.calories_total += calories - self.calories_last
+        self.calories_last = calories
+        if self.calories_total > 255:
+            self.calories_total -= 255
+            if self.calories_total > 255:  # after reconnect
+                self.calories_total = 1
+
+        # Accumulated distance in m, rollover = 256
+        self.distance_accu += distance - self.distance_old
+        self.distance_old = distance
+        if self.distance_accu > 255:
+            self.distance_accu -= 255
+            if self.distance_accu > 255:  # after reconnect
+                self.distance_accu = 1
+
+        # Time only advances while distance or speed change (see specification)
+        if self.speed_last != speed or self.distance_last != self.distance_accu:
+            self.time_rollover += elapsed
+            if self.time_rollover > 255:
+                self.time_rollover -= 255
+                if self.time_rollover > 255:  # after reconnect
+                    self.time_rollover = 1
+        self.speed_last = speed
+        self.distance_last = self.distance_accu
+
+        page = PAGE_SCHEDULE[self.tick]
+        self.tick += 1
+        if self.tick == ROTATION_LENGTH:
+            self.tick = 0
+
+        buffer = self.buffer
+        if page == 80:
+            buffer[:] = PAGE_80
+        elif page == 81:
+            buffer[:] = PAGE_81
+        else:
+            time_h = int(self.time_rollover)
+            time_l = int((self.time_rollover - time_h) * 200)
+            distance_h = int(self.distance_accu)
+            distance_l = int((self.distance_accu - distance_h) * 16)
+            speed_h = int(speed)
+            speed_l = int((speed - speed_h) * 256)
+            buffer[0] = 0x01  # Data Page 1
+            buffer[1] = time_l  # Time fractional, 1/200 s
+            buffer[2] = time_h  # Time integer, s
+            buffer[3] = distance_h  # Distance accumulated, integer
+            buffer[4] = distance_l * 16 + speed_h  # Distance fractional & speed integer
+            buffer[5] = speed_l  # Instantaneous speed, fractional
+            buffer[6] = self.strides_done  # Stride count - required
+            latency = int(elapsed / LATENCY_UNIT)
+            buffer[7] = latency if latency < 256 else 255  # Update latency
+        return buffer
+
+
+def run_legacy(hours):
+    clock = SimulatedClock()
+    pages = LegacyPages(clock)
+    pages.treadmill_speed = SPEED
+
+    def tick(tick_number):
+        clock.now += TICK
+        pages.treadmill_distance = int(tick_number * TICK * SPEED)
+        pages.create_next_datapage()
+    return measure(tick, hours)
+
+
+def run_float_engine(hours):
+    clock = SimulatedClock()
+    pages = FloatStrideEngine()
+
+    def tick(tick_number):
+        clock.now += TICK
+        pages.next_page(clock.now, (SPEED, int(tick_number * TICK * SPEED), 0))
+    return measure(tick, hours)
+
+
+def run_engine(hours):
+    now = [1000 * NS]
+    pages = StridePageEngine()
+
+    def tick(tick_number):
+        now[0] += TICK_NS
+        pages.next_page(now[0], (SPEED, int(tick_number * TICK * SPEED), 0))
+    return measure(tick, hours)
+
+
+def measure(tick, hours):
+    per_hour = []
+    tick_number = 0
+    for _ in range(hours):
+        worst = 0
+        start = time.perf_counter_ns()
+        for _ in range(TICKS_PER_HOUR):
+            tick_start = time.perf_counter_ns()
+            tick(tick_number)
+            worst = max(worst, time.perf_counter_ns() - tick_start)
+            tick_number += 1
+        per_hour.append(((time.perf_counter_ns() - start) / TICKS_PER_HOUR, worst))
+    return per_hour
+
+
+def main():
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"{TICKS_PER_HOUR} ticks per simulated hour, {hours} hours")
+    for name, run in (("legacy", run_legacy), ("float", run_float_engine), ("integer", run_engine)):
+        per_hour = run(hours)
+        for hour, (mean, worst) in enumerate(per_hour, start=1):
+            print(f"{name:7s} hour {hour:3d}: {mean:7.0f} ns/tick mean, {worst / 1000:7.1f} us worst")
+
+
+if __name__ == "__main__":
+    main()
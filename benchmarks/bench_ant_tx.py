@@ -0,0 +1,54 @@
+"""TX callback latency, jitter and missed slots of AntSend on the fake ANT node.
+
+Runs the stride channel (and with "fec" the FE-C channel on the same node) for a number of seconds,
+optionally with busy threads competing for the interpreter, and prints the fake channels' statistics.
+Run from the repository root: python benchmarks/bench_ant_tx.py [seconds] [busy threads] [fec]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import antstride  # noqa: E402
+from fake_ant import FakeNode  # noqa: E402
+
+
+class PrintBus:
+    # the parts of event_bus.EventBus AntSend publishes to
+    def publish_log(self, source, text):
+        print(source + ": " + text)
+
+    def publish_connection_state(self, link, connected):
+        pass
+
+
+def busy(stop):
+    value = 0
+    while not stop.is_set():
+        value = (value * 31 + 7) % 1000003
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    stop = threading.Event()
+    for _ in range(threads):
+        threading.Thread(target=busy, args=(stop,), daemon=True).start()
+
+    ant = antstride.AntSend(bus=PrintBus(), node_factory=FakeNode, fitness_equipment="fec" in sys.argv[3:])
+    ant.update_state(10.5 / 3.6, 0, 0)
+    ant.start()
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        time.sleep(0.25)
+        ant.update_state(10.5 / 3.6, int((time.monotonic() - start) * 10.5 / 3.6), 0)
+    ant.stop()
+    stop.set()
+    ant.node_thread.join()
+
+
+if __name__ == "__main__":
+    main()
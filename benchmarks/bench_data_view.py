@@ -0,0 +1,109 @@
+"""Repaint cost per treadmill notification of the data display.
+
+Feeds a 10 Hz session (speed changing every 10 s, time every second) through the old update_data,
+which formatted and set all six labels per notification, and through data_view.DataViewModel at
+4 Hz and unthrottled. Reports setText calls and time per notification. With PySide6 installed the
+labels are real QLabels on the offscreen platform, so relayout is included; otherwise they only
+count the calls.
+Run from the repository root: python benchmarks/bench_data_view.py [notifications]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_view import DataViewModel  # noqa: E402
+from ftms_data import TreadmillData  # noqa: E402
+
+RATE = 10  # notifications/s
+
+try:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication, QLabel
+except ImportError:
+    QApplication = None
+
+    class QLabel:
+        def setText(self, text):
+            pass
+
+
+class CountingLabel(QLabel):
+    calls = 0
+
+    def setText(self, text):
+        CountingLabel.calls += 1
+        super().setText(text)
+
+
+def legacy_update(labels, data):
+    # TreadmillGUI.update_data before the view model
+    speed = data.speed/100
+    if data.speed != 0:
+        pace = str(int(6000/data.speed)) + ":" + str(int((6000/data.speed - int(6000/data.speed))*60)).zfill(2)
+    else:
+        pace = "00:00"
+    distance = data.total_distance/1000
+    if data.elapsed_time < 60:
+        time_elapsed = "00:" + str(data.elapsed_time).zfill(2)
+    elif data.elapsed_time < 3600:
+        time_elapsed = str(data.elapsed_time//60).zfill(2) + ":" + str(data.elapsed_time % 60).zfill(2)
+    else:
+        time_elapsed = (str(data.elapsed_time//3600) + ":"
+                        + str((data.elapsed_time % 3600)//60).zfill(2) + ":"
+                        + str(data.elapsed_time % 60).zfill(2))
+    incline = data.inclination/10
+    calories = data.total_energy
+    for field, value in zip(labels, [str(speed), pace, str(distance), time_elapsed, str(incline), str(calories)]):
+        field.setText(str(value))
+
+
+def session(count):
+    records = []
+    for i in range(count):
+        record = TreadmillData()
+        seconds = i // RATE
+        record.speed = 800 + (seconds // 10) % 10 * 50
+        record.total_distance = seconds * 3
+        record.elapsed_time = seconds
+        record.inclination = 10
+        record.total_energy = seconds // 15
+        records.append(record)
+    return records
+
+
+def run(name, records, update):
+    labels = [CountingLabel() for _ in range(6)]
+    CountingLabel.calls = 0
+    start = time.perf_counter()
+    update(labels, records)
+    elapsed = time.perf_counter() - start
+    print(f"{name:26s} {CountingLabel.calls / len(records):6.2f} setText/notification  "
+          f"{elapsed / len(records) * 1e6:8.2f} us/notification")
+
+
+def view_model(rate):
+    def update(labels, records):
+        view = DataViewModel(max_rate=rate)
+        for i, record in enumerate(records):
+            view.update(record)
+            now = i / RATE  # session clock, a paint is due once delay() reaches 0
+            if view.delay(now) == 0:
+                for index, text in view.changes(now):
+                    labels[index].setText(text)
+    return update
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 36000
+    app = QApplication([]) if QApplication is not None else None  # noqa: F841
+    print(f"{count} notifications at {RATE} Hz, {'QLabel' if app is not None else 'counting stub'}")
+    records = session(count)
+    run("legacy update_data", records, lambda labels, rs: [legacy_update(labels, r) for r in rs])
+    run("view model, unthrottled", records, view_model(0))
+    run("view model, 4 Hz", records, view_model(4.0))
+
+
+if __name__ == "__main__":
+    main()
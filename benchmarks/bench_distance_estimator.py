@@ -0,0 +1,155 @@
+"""Distance error of the ANT+ feed with and without the DistanceEstimator, on recorded sessions.
+
+Reads session logs (session_log.SessionReader) and replays their treadmill data against a 4 Hz TX
+clock. Ground truth is the recorded speed integrated between notifications (trapezoid), aligned so
+that it truncates to the recorded whole metres. A distance drop starts a new segment (reset).
+Compared: the raw treadmill distance the channels broadcast before, and the estimator. Reports the
+absolute error per TX event, the largest step between two TX events, backwards steps and the cost.
+Without a path a synthetic session (1 Hz notifications with jitter, speed ramps and pauses) is
+recorded to a temporary file first.
+Run from the repository root: python benchmarks/bench_distance_estimator.py [session log ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distance_estimator import DistanceEstimator, NS  # noqa: E402
+from ftms_data import decode_treadmill_data, encode_treadmill_data, TreadmillData  # noqa: E402
+from session_log import MAGIC, RECORD, SessionReader, TREADMILL_DATA  # noqa: E402
+
+TX_PERIOD_NS = 8134 * NS // 32768
+
+
+def record_synthetic(path, minutes=60, seed=1):
+    rng = random.Random(seed)
+    record = TreadmillData()
+    record.flags = 0x0004  # speed, total distance
+    step = NS // 100
+    t = 0
+    speed = target = distance = 0.0  # km/h, m
+    next_target = 0
+    next_notify = NS
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        while t < minutes * 60 * NS:
+            t += step
+            if t >= next_target:
+                target = rng.choice((0.0, rng.uniform(6.0, 16.0)))
+                next_target = t + rng.randint(20, 300) * NS
+            speed += max(-0.01, min(0.01, target - speed))  # 1 km/h per s
+            distance += speed / 3.6 * step / NS
+            if t >= next_notify:
+                next_notify = t + NS + rng.randint(-50, 50) * NS // 1000
+                record.speed = int(speed * 100)
+                record.total_distance = int(distance)
+                data = encode_treadmill_data(record)
+                file.write(RECORD.pack(t, TREADMILL_DATA, len(data)) + data)
+
+
+def segments(path):
+    # [(time ns, speed m/s, distance m)] per segment between resets
+    reader = SessionReader(path)
+    record = TreadmillData()
+    current = []
+    result = [current]
+    records = iter(reader)
+    for t_ns, uuid, data in records:
+        if uuid != TREADMILL_DATA:
+            continue
+        decode_treadmill_data(data, record)
+        if current and record.total_distance < current[-1][2]:
+            current = []
+            result.append(current)
+        current.append((t_ns, record.speed / 360, record.total_distance))
+    del data
+    records.close()  # releases the views into the map
+    reader.close()
+    return [segment for segment in result if len(segment) > 1]
+
+
+def ground_truth(samples):
+    # integrated speed per sample, offset to the middle of the range that truncates to the recorded metres
+    integral = [0.0]
+    for (t0, v0, _), (t1, v1, _) in zip(samples, samples[1:]):
+        integral.append(integral[-1] + (v0 + v1) / 2 * (t1 - t0) / NS)
+    low = max(d - i for (_, _, d), i in zip(samples, integral))
+    high = min(d + 1 - i for (_, _, d), i in zip(samples, integral))
+    offset = (low + high) / 2 if high > low else low
+    return [i + offset for i in integral]
+
+
+def evaluate(samples, truth, estimator):
+    errors = []
+    steps = []
+    backwards = 0
+    cost = 0
+    index = 0
+    previous = None
+    now = samples[0][0]
+    end = samples[-1][0]
+    while now <= end:
+        while index + 1 < len(samples) and samples[index + 1][0] <= now:
+            index += 1
+            if estimator is not None:
+                estimator.sample(*samples[index])
+        t0, v0, _ = samples[index]
+        if index + 1 < len(samples):
+            t1, v1, _ = samples[index + 1]
+            speed = v0 + (v1 - v0) * (now - t0) / (t1 - t0)
+            true = truth[index] + (v0 + speed) / 2 * (now - t0) / NS
+        else:
+            true = truth[index]
+        if estimator is None:
+            value = samples[index][2]
+        else:
+            start = time.perf_counter_ns()
+            value = estimator.estimate(now)
+            cost += time.perf_counter_ns() - start
+        errors.append(abs(value - true))
+        if previous is not None:
+            steps.append(value - previous)
+            backwards += value < previous
+        previous = value
+        now += TX_PERIOD_NS
+    return errors, steps, backwards, cost
+
+
+def report(name, results):
+    errors = sorted(e for result in results for e in result[0])
+    steps = [s for result in results for s in result[1]]
+    backwards = sum(result[2] for result in results)
+    cost = sum(result[3] for result in results)
+    print(f"{name:10s} error mean {sum(errors) / len(errors):5.2f} m, p95 {errors[len(errors) * 95 // 100]:5.2f} m, "
+          f"max {errors[-1]:5.2f} m, largest step {max(steps):5.2f} m, {backwards} backwards"
+          + (f", {cost / len(errors):.0f} ns/TX event" if cost else ""))
+
+
+def main():
+    paths = sys.argv[1:]
+    directory = None
+    if not paths:
+        directory = tempfile.TemporaryDirectory()
+        paths = [os.path.join(directory.name, "synthetic.ftmslog")]
+        record_synthetic(paths[0])
+    raw = []
+    estimated = []
+    for path in paths:
+        for samples in segments(path):
+            truth = ground_truth(samples)
+            raw.append(evaluate(samples, truth, None))
+            estimator = DistanceEstimator()
+            estimator.sample(*samples[0])
+            estimated.append(evaluate(samples, truth, estimator))
+    print(f"{len(raw)} segments, {sum(len(r[0]) for r in raw)} TX events")
+    report("raw", raw)
+    report("estimator", estimated)
+    if directory is not None:
+        directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
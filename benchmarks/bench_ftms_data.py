@@ -0,0 +1,39 @@
+"""Per-notification decode cost of Treadmill Data (0x2ACD).
+
+Compares the fixed-layout unpack TreadmillGUI.ftms_td used to do with ftms_data.decode_treadmill_data.
+Run from the repository root: python benchmarks/bench_ftms_data.py
+"""
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ftms_data import decode_treadmill_data, TreadmillData  # noqa: E402
+
+# flags 0x058C, 10.5 km/h, 1234 m, 2.0 %, 87 kcal, HR 140, 00:10:05
+SAMPLE = bytes(struct.pack('<HHHBhhHHBBH', 0x058C, 1050, 1234, 0, 20, 0, 87, 600, 10, 140, 605))
+NUMBER = 200000
+
+
+def legacy_decode(data):
+    payload = data[2:]
+    fmt = '<HHBHHHHBBH'
+    return list(struct.unpack(fmt, bytes(payload[0:struct.calcsize(fmt)])))
+
+
+def main():
+    record = TreadmillData()
+    cases = (
+        ("legacy fixed layout", lambda: legacy_decode(SAMPLE)),
+        ("decode, new record", lambda: decode_treadmill_data(SAMPLE)),
+        ("decode, reused record", lambda: decode_treadmill_data(SAMPLE, record)),
+    )
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=NUMBER, repeat=5))
+        print(f"{name:24s} {best / NUMBER * 1e9:8.0f} ns/notification")
+
+
+if __name__ == "__main__":
+    main()
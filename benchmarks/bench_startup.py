@@ -0,0 +1,40 @@
+"""Startup time and resident memory of the GUI and the headless entry point.
+
+Starts each entry point with --exit-after-startup a few times and collects the startup line it
+prints (time since process start until the event loop runs, RSS at that point). The GUI runs on
+the offscreen Qt platform.
+Run from the repository root: python benchmarks/bench_startup.py [runs]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = (("GUI", "PyQT-Treadmill-Bridge.py"), ("headless", "bridge_daemon.py"))
+REPORT = re.compile(r"Startup \w+: (\d+) ms since process start, RSS ([\d.]+) MB")
+
+
+def measure(script):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run([sys.executable, os.path.join(ROOT, script), "--exit-after-startup"],
+                            capture_output=True, text=True, env=env, cwd=ROOT, timeout=60)
+    match = REPORT.search(result.stdout + result.stderr)
+    if match is None:
+        raise RuntimeError(f"{script} printed no startup report:\n{result.stdout}{result.stderr}")
+    return int(match.group(1)), float(match.group(2))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, script in ENTRY_POINTS:
+        samples = [measure(script) for _ in range(runs)]
+        times = [sample[0] for sample in samples]
+        memory = [sample[1] for sample in samples]
+        print(f"{name:9s} startup median {statistics.median(times):6.0f} ms (min {min(times)}), "
+              f"RSS median {statistics.median(memory):6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Chart cost over the session length with time_series.SessionSeries.
+
+Fills a series with 1 Hz samples for sessions of 10 minutes up to 50 hours and times what a chart
+redraw fetches (the whole session's speed, pace and incline at 800 buckets, the chart width), and
+the same from a plain growing list, the approach that was not taken. Memory of the series is fixed.
+Needs numpy.
+Run from the repository root: python benchmarks/bench_time_series.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from time_series import INCLINE, SPEED, SessionSeries, pace  # noqa: E402
+
+POINTS = 800
+SESSIONS = (600, 3600, 5 * 3600, 50 * 3600)  # s
+
+
+def redraw(series):
+    t, low, high, mean = series.window(SPEED, points=POINTS)
+    pace(low, high, mean)
+    series.window(INCLINE, points=POINTS)
+    return len(t)
+
+
+def list_redraw(samples):
+    # whole-history list: the arrays handed to a chart grow with the session
+    data = np.array(samples)
+    speed = data[:, 1]
+    return len(np.where(speed > 0, 60 / np.maximum(speed, 3.0), np.nan))
+
+
+def timed(func, *args, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    rng = random.Random(1)
+    series = SessionSeries()
+    samples = []
+    append_time = 0.0
+    t = 0
+    for session in SESSIONS:
+        while t < session:
+            values = (rng.choice((0.0, rng.uniform(6.0, 16.0))), rng.uniform(0.0, 5.0))
+            start = time.perf_counter()
+            series.append(float(t), values)
+            append_time += time.perf_counter() - start
+            samples.append((float(t),) + values)
+            t += 1
+        cost, buckets = timed(redraw, series)
+        list_cost, list_points = timed(list_redraw, samples, repeat=3)
+        print(f"{session / 3600:5.1f} h: series redraw {cost * 1e3:6.2f} ms ({buckets} buckets, "
+              f"{series.memory() / 1024:.0f} KB), growing list {list_cost * 1e3:7.2f} ms ({list_points} points)")
+    print(f"append {append_time / t * 1e6:.1f} us/sample")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Randomized property check of the ANT+ stride page accumulators over long sessions.
+
+Simulates sessions of random speed segments, pauses, TX jitter, missed TX events and treadmill
+distance resets (reconnects), decodes every page 1 the way a watch does (summing the wrapped
+deltas) and checks against the exact totals:
+  - accumulated time equals the time moving, in 1/200 s
+  - accumulated distance equals the sum of forward distance steps, in 1/16 m
+  - accumulated strides equal the time moving divided by the stride interval
+  - no delta between two pages exceeds half the rollover range (no jumps)
+  - the speed field is the snapshot speed in 1/256 m/s
+The float engine that preceded the integer one is decoded alongside for comparison.
+Run from the repository root: python benchmarks/check_ant_accumulators.py [sessions] [hours] [seed]
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ant_pages import NS, TIME_TICK_NS, StridePageEngine  # noqa: E402
+from bench_ant_pages import FloatStrideEngine  # noqa: E402
+
+PERIOD_NS = 8134 * NS // 32768
+CADENCE = 160
+
+
+class Receiver:
+    """Sums page 1 deltas like a watch: time in 1/200 s, distance in 1/16 m, strides."""
+
+    def __init__(self):
+        self.last = None
+        self.time = 0
+        self.distance = 0
+        self.strides = 0
+        self.max_jump = (0, 0, 0)
+
+    def page(self, payload):
+        if payload[0] != 1:
+            return
+        fields = (payload[2] * 200 + payload[1], payload[3] * 16 + (payload[4] >> 4), payload[6])
+        if self.last is not None:
+            deltas = [(new - old) % wrap for new, old, wrap in zip(fields, self.last, (51200, 4096, 256))]
+            self.time += deltas[0]
+            self.distance += deltas[1]
+            self.strides += deltas[2]
+            self.max_jump = tuple(max(jump, delta) for jump, delta in zip(self.max_jump, deltas))
+        self.last = fields
+
+
+def session(rng, hours):
+    # yields (now ns, (speed m/s, distance m, calories), moving ns this tick, forward distance 1/16 m)
+    now = 1000 * NS
+    distance = 0.0
+    end = now + int(hours * 3600 * NS)
+    calories = 0
+    last_distance = None
+    while now < end:
+        speed = rng.choice((0.0, rng.uniform(0.3, 5.5)))
+        integer_distance = rng.random() < 0.5  # FTMS sends whole metres, the estimator fractions
+        for _ in range(rng.randint(20, 4000)):
+            elapsed = PERIOD_NS + rng.randint(-2_000_000, 2_000_000)
+            if rng.random() < 0.002:
+                elapsed += PERIOD_NS * rng.randint(1, 8)  # missed TX events
+            now += elapsed
+            distance += speed * elapsed / NS
+            if rng.random() < 0.00002:
+                distance = 0.0  # treadmill reset / reconnect
+            calories = int(distance / 15)
+            reported = float(int(distance)) if integer_distance else distance
+            sixteenths = int(reported * 16)
+            forward = 0
+            if last_distance is not None and sixteenths > last_distance:
+                forward = sixteenths - last_distance
+            last_distance = sixteenths
+            yield now, (speed, reported, calories), elapsed, forward
+
+
+def check(seed, hours):
+    rng = random.Random(seed)
+    stride_ns = 60 * NS * 2 // CADENCE
+    engine = StridePageEngine(cadence=CADENCE)
+    legacy = FloatStrideEngine(cadence=CADENCE)
+    receiver = Receiver()
+    legacy_receiver = Receiver()
+    moving_ns = 0
+    forward_total = 0
+    start = None  # (moving ns, forward) when the receiver saw the first page 1
+    first = True
+    for now, snapshot, elapsed, forward in session(rng, hours):
+        if not first and (snapshot[0] > 0 or forward):
+            moving_ns += elapsed
+        first = False
+        forward_total += forward
+        payload = engine.next_page(now, snapshot)
+        if payload[0] == 1:
+            speed_units = min(int(snapshot[0] * 256), 0xFFF)
+            assert (payload[4] & 0xF) << 8 | payload[5] == speed_units, (payload, snapshot)
+            if start is None:
+                start = (moving_ns, forward_total)
+        receiver.page(payload)
+        legacy_receiver.page(legacy.next_page(now / NS, snapshot))
+
+    expected = (moving_ns // TIME_TICK_NS - start[0] // TIME_TICK_NS,
+                forward_total - start[1],
+                moving_ns // stride_ns - start[0] // stride_ns)
+    return receiver, legacy_receiver, expected
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    failures = 0
+    for index in range(sessions):
+        receiver, legacy_receiver, expected = check(seed + index, hours)
+        decoded = (receiver.time, receiver.distance, receiver.strides)
+        # half the rollover range: 128 s, 128 m, 128 strides
+        jumps_ok = all(jump < limit for jump, limit in zip(receiver.max_jump, (25600, 2048, 128)))
+        ok = decoded == expected and jumps_ok
+        failures += not ok
+        print(f"session {index + 1} (seed {seed + index}): {'ok' if ok else 'FAILED'}, "
+              f"time {receiver.time / 200:.2f} s, distance {receiver.distance / 16:.1f} m, "
+              f"strides {receiver.strides}")
+        if not ok:
+            print(f"  expected time {expected[0] / 200:.2f} s, distance {expected[1] / 16:.1f} m, "
+                  f"strides {expected[2]}, largest deltas {receiver.max_jump}")
+        print(f"  float engine error: time {(legacy_receiver.time - expected[0]) / 200:+.2f} s, "
+              f"distance {(legacy_receiver.distance - expected[1]) / 16:+.1f} m, "
+              f"strides {legacy_receiver.strides - expected[2]:+d}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Pure-Python stand-ins for PySide6, so the Qt hot paths run headless in the benchmarks.
+
+install() puts fake PySide6, PySide6.QtCore and PySide6.QtBluetooth modules into sys.modules before
+central, peripheral or control_point are imported, also where PySide6 is installed, so results do
+not depend on it. QByteArray and QBluetoothUuid behave like the
+real ones as far as the hot paths use them (data(), comparing and hashing UUIDs); every other name
+is a stub that can be constructed, subclassed, called and chained, and does nothing. QTimer
+callbacks never run: a benchmark drives what the event loop would.
+"""
+import sys
+import types
+
+
+class _StubType(type):
+    def __getattr__(cls, name):  # enum values, static methods, ...
+        return _Stub()
+
+
+class _Stub(metaclass=_StubType):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return _Stub()
+
+    def __call__(self, *args, **kwargs):
+        return _Stub()
+
+    def __or__(self, other):  # flag combinations
+        return self
+
+    __ror__ = __or__
+
+
+class QByteArray(_Stub):
+    __slots__ = ('_data',)
+
+    def __init__(self, data=b''):
+        self._data = bytes(data)
+
+    def data(self):
+        return self._data
+
+    @classmethod
+    def fromHex(cls, data):
+        return cls(bytes.fromhex(bytes(data).decode()))
+
+    @classmethod
+    def fromStdString(cls, text):
+        return cls(text.encode())
+
+    def __eq__(self, other):
+        return isinstance(other, QByteArray) and self._data == other._data
+
+    def __hash__(self):
+        return hash(self._data)
+
+
+class QBluetoothUuid(_Stub):
+    __slots__ = ('_value',)
+
+    def __init__(self, value=0):
+        self._value = value._value if isinstance(value, QBluetoothUuid) else value
+
+    def __eq__(self, other):
+        return isinstance(other, QBluetoothUuid) and self._value == other._value
+
+    def __hash__(self):
+        return hash(self._value)
+
+
+def _module(name, classes):
+    module = types.ModuleType(name)
+    module.__dict__.update(classes)
+    module.__getattr__ = lambda attribute: _Stub  # any other class
+    return module
+
+
+def install():
+    # returns False if PySide6 (real or fake) is already imported, nothing is replaced then
+    if "PySide6" in sys.modules:
+        return False
+    core = _module("PySide6.QtCore", {"QByteArray": QByteArray})
+    bluetooth = _module("PySide6.QtBluetooth", {"QBluetoothUuid": QBluetoothUuid})
+    package = _module("PySide6", {"QtCore": core, "QtBluetooth": bluetooth})
+    package.__path__ = []
+    sys.modules.update({"PySide6": package, "PySide6.QtCore": core, "PySide6.QtBluetooth": bluetooth})
+    return True
@@ -0,0 +1,336 @@
+"""Benchmark suite of the bridge hot paths, with stored baselines.
+
+Every case runs one operation of a hot path on fake inputs (no treadmill, adapter or ANT+ stick):
+
+  ftms decode         decode_treadmill_data into the reused record, as TreadmillGUI.ftms_td does
+  display update      DataViewModel.update and changes(), i.e. update_data + paint_data unthrottled
+  sample pipeline     SamplePipeline (calibration, spikes, smoothing, clamp) and the BLE re-encode
+  notification buffer push of a sample (a status every 10th), drain and dispatch, as BleCentral does
+  ant page            AntSend.update_state every 4th operation, create_next_datapage every one
+  ant page fec        the same on the FE-C page engine
+  central dispatch    BleCentral.update_ftms_value on a fake characteristic
+  peripheral notify   FtmsPeripheral.ftms_value + notification_provider on a fake service
+
+The Qt cases run on fake_qt's pure-Python PySide6, installed before anything imports Qt, so they
+run and measure the same with or without PySide6 installed.
+
+and reports ops/s (median of --runs runs of about --time s each, with their spread) and, measured
+separately with tracemalloc, the bytes allocated at the peak of one operation and the bytes still
+held afterwards, per operation.
+
+The result is compared with the baseline file. By default only allocations are checked: they hardly
+depend on the machine and do not vary between runs, more bytes per operation than the baseline by
+more than --threshold (fraction) is a regression and the run exits with 1. Timing varies by 20-40 %
+between runs on a busy machine and completely between machines, so ops/s are only checked with
+--speed, against an ops/s baseline saved on the same machine with --save --speed; a median below
+the baseline by more than --threshold plus half the spread of the runs is a regression. The
+committed baseline holds allocations only.
+Run from the repository root:
+  python benchmarks/run.py [--save] [--speed] [--baseline FILE] [--threshold X] [--runs N] [case ...]
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import struct
+import sys
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_qt  # noqa: E402
+
+fake_qt.install()
+
+from data_view import DataViewModel  # noqa: E402
+from ftms_data import decode_treadmill_data, encode_treadmill_data, treadmill_flags, TreadmillData  # noqa: E402
+from notification_buffer import NotificationBuffer, COALESCE  # noqa: E402
+from sample_pipeline import build_pipeline  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SLACK_BYTES = 16  # allocation noise of a single operation, below which nothing is a regression
+
+TREADMILL_DATA = 0x2ACD
+FTMS_STATUS = 0x2ADA
+
+
+def samples(count=64):
+    # treadmill data notifications, flags 0x058C: speed, distance, incline, energy, heart rate, time
+    return [struct.pack('<HHHBhhHHBBH', 0x058C, 1000 + i % 8 * 50, 1000 + i, 0, 10 + i % 4, 0,
+                        80 + i // 16, 600, 10, 140 + i % 5, 600 + i) for i in range(count)]
+
+
+def cycle(values):
+    # next() over values forever, cheaper than itertools.cycle plus a lambda in the timed loop
+    values = list(values)
+    state = [0]
+    size = len(values)
+
+    def next_value():
+        index = state[0]
+        state[0] = (index + 1) % size
+        return values[index]
+    return next_value
+
+
+def ftms_decode():
+    record = TreadmillData()
+    sample = cycle(samples())
+    return lambda: decode_treadmill_data(sample(), record)
+
+
+def display_update():
+    view = DataViewModel(max_rate=0)
+    records = [decode_treadmill_data(data) for data in samples()]
+    record = cycle(records)
+
+    def op():
+        view.update(record())
+        view.changes(0.0)
+    return op
+
+
+def sample_pipeline():
+    pipeline = build_pipeline(speed_factor=1.03, distance_factor=1.03, smoothing=3)
+    records = [decode_treadmill_data(data) for data in samples()]
+    record = cycle(records)
+    return lambda: encode_treadmill_data(pipeline.process(record()))
+
+
+def notification_buffer():
+    buffer = NotificationBuffer(max_depth=32, policies={TREADMILL_DATA: COALESCE},
+                                variants={TREADMILL_DATA: treadmill_flags})
+    dispatchers = {TREADMILL_DATA: lambda data: None, FTMS_STATUS: lambda data: None}
+    sample = cycle(samples(10))
+    count = [0]
+
+    def op():
+        count[0] += 1
+        buffer.push(TREADMILL_DATA, sample())
+        if count[0] % 10 == 0:
+            buffer.push(FTMS_STATUS, b'\x04')
+        for key, data, trace in buffer.drain():
+            dispatchers[key](data)
+    return op
+
+
+class NullBus:
+    # the parts of event_bus.EventBus AntSend publishes to
+    def publish_log(self, source, text):
+        pass
+
+    def publish_connection_state(self, link, connected):
+        pass
+
+
+def ant_page(fitness_equipment=False):
+    import antstride
+    import time
+    ant = antstride.AntSend(NullBus(), fitness_equipment=fitness_equipment)
+    if fitness_equipment:
+        pages = ant.profiles[1][2]
+
+        def next_page():
+            # what on_event_tx does for the FE-C channel, without the broadcast
+            now = time.monotonic_ns()
+            return pages.next_page(now, ant.snapshot(now))
+    else:
+        next_page = ant.create_next_datapage
+    count = [0]
+
+    def op():
+        count[0] += 1
+        if count[0] % 4 == 0:  # about one treadmill sample per four TX events
+            ant.update_state(2.9, count[0] // 4, count[0] // 64, 1.0, 140)
+        return next_page()
+    return op
+
+
+class FakeCharacteristic:
+    def __init__(self, uuid):
+        self._uuid = uuid
+
+    def uuid(self):
+        return self._uuid
+
+
+class FakeService:
+    def writeCharacteristic(self, characteristic, value):
+        pass
+
+
+def central_dispatch():
+    from PySide6.QtCore import QByteArray
+    import central
+    # the handler on a bare instance: no discovery agent, controller or adapter behind it
+    backend = object.__new__(central.BleCentral)
+    backend.tracer = None
+    backend.recorder = None
+    backend.notifications = NotificationBuffer(max_depth=32, policies={TREADMILL_DATA: COALESCE},
+                                               variants={TREADMILL_DATA: treadmill_flags})
+    # a queued status keeps the buffer non-empty, so no drain is scheduled (there is no event loop)
+    backend.notifications.push(FTMS_STATUS, b'\x04')
+    characteristic = FakeCharacteristic(central.TREADMILL_DATA_UUID)
+    value = cycle(QByteArray(data) for data in samples())
+    return lambda: backend.update_ftms_value(characteristic, value())
+
+
+def peripheral_notify():
+    import peripheral
+    # the notify path on a bare instance with a connected fake service, no controller behind it
+    server = object.__new__(peripheral.FtmsPeripheral)
+    server.tracer = None
+    server.shared = peripheral.SharedValues()
+    server.values = server.shared.values
+    server.sent = set()
+    server.notifications_sent = server.notifications_dropped = 0
+    server.peripheral_connected = True
+    uuids = (peripheral.TREADMILL_DATA, peripheral.FTMS_STATUS, peripheral.TRAINING_STATUS)
+    server.notify_chars = {uuid: (FakeService(), None) for uuid in uuids}
+    sample = cycle(samples())
+    count = [0]
+
+    def op():
+        count[0] += 1
+        server.ftms_value = sample()
+        if count[0] % 4 == 0:  # the keep-alive timer runs far less often than notifications arrive
+            server.notification_provider()
+    return op
+
+
+CASES = {
+    "ftms decode": ftms_decode,
+    "display update": display_update,
+    "sample pipeline": sample_pipeline,
+    "notification buffer": notification_buffer,
+    "ant page": ant_page,
+    "ant page fec": lambda: ant_page(fitness_equipment=True),
+    "central dispatch": central_dispatch,
+    "peripheral notify": peripheral_notify,
+}
+
+
+def ops_per_second(op, seconds, runs):
+    # (median ops/s, spread of the runs as a fraction of the median)
+    timer = timeit.Timer(op)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * seconds / elapsed))
+    rates = [number / elapsed for elapsed in timer.repeat(repeat=runs, number=number)]
+    median = statistics.median(rates)
+    return median, (max(rates) - min(rates)) / median
+
+
+def allocations(op, count=2000):
+    # (bytes at the peak of one operation, bytes still held afterwards) per operation
+    for _ in range(100):
+        op()  # caches and lazily built layouts are not part of the steady state
+    gc.collect()
+    tracemalloc.start()
+    peak_total = 0
+    start = tracemalloc.get_traced_memory()[0]
+    for _ in range(count):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        op()
+        peak_total += tracemalloc.get_traced_memory()[1] - base
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return peak_total / count, max(0, retained) / count
+
+
+def run(names, seconds, runs):
+    results = {}
+    for name in names:
+        try:
+            op = CASES[name]()
+        except ImportError as e:
+            print(f"{name:20s} skipped: {e}")
+            continue
+        peak, retained = allocations(op)
+        rate, spread = ops_per_second(op, seconds, runs)
+        results[name] = {"ops_per_s": rate, "spread": spread, "bytes_per_op": peak,
+                         "retained_bytes_per_op": retained}
+    return results
+
+
+def compare(results, baseline, threshold, speed_check=False):
+    # prints one line per case, returns the names of the regressed cases
+    regressions = []
+    for name, result in results.items():
+        line = (f"{name:20s} {result['ops_per_s']:12,.0f} ops/s +/-{result['spread'] / 2:4.0%}  "
+                f"{result['bytes_per_op']:7.0f} B/op  {result['retained_bytes_per_op']:6.1f} B/op retained")
+        base = baseline.get(name)
+        if base is None:
+            print(line + "  (no baseline)")
+            continue
+        slower = False
+        if speed_check:
+            if "ops_per_s" in base:
+                speed = result["ops_per_s"] / base["ops_per_s"] - 1
+                line += f"  {speed:+6.1%} ops/s"
+                slower = speed < -(threshold + result["spread"] / 2)
+            else:
+                line += "  (no ops/s baseline)"
+        larger = result["bytes_per_op"] > base["bytes_per_op"] * (1 + threshold) + SLACK_BYTES
+        leaking = result["retained_bytes_per_op"] > base["retained_bytes_per_op"] * (1 + threshold) + SLACK_BYTES
+        if slower or larger or leaking:
+            regressions.append(name)
+            line += "  REGRESSION" + "".join(f" ({what})" for what, bad in
+                                             (("slower", slower), ("allocates more", larger),
+                                              ("retains more", leaking)) if bad)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the bridge hot paths")
+    parser.add_argument("cases", nargs="*", metavar="case", help=f"cases to run (default all: {', '.join(CASES)})")
+    parser.add_argument("--baseline", metavar="FILE", default=DEFAULT_BASELINE,
+                        help="baseline results (default benchmarks/baseline.json)")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline instead of comparing")
+    parser.add_argument("--speed", action="store_true",
+                        help="also check (or with --save store) ops/s; only meaningful on the machine that saved them")
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="fraction of extra allocation (and with --speed slowdown beyond the noise) "
+                             "counted as a regression (default 0.3)")
+    parser.add_argument("--time", type=float, default=0.2, metavar="S",
+                        help="seconds per timing run (default 0.2)")
+    parser.add_argument("--runs", type=int, default=7, metavar="N",
+                        help="timing runs per case, the median counts (default 7)")
+    options = parser.parse_args()
+    unknown = [name for name in options.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case {', '.join(unknown)}")
+
+    results = run(options.cases or list(CASES), options.time, options.runs)
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    if options.save:
+        compare(results, {}, options.threshold)
+        for name, result in results.items():
+            saved = {"bytes_per_op": result["bytes_per_op"], "retained_bytes_per_op": result["retained_bytes_per_op"]}
+            if options.speed:
+                saved["ops_per_s"] = result["ops_per_s"]
+            elif "ops_per_s" in baseline.get(name, {}):
+                saved["ops_per_s"] = baseline[name]["ops_per_s"]  # keep a speed baseline saved before
+            baseline[name] = saved
+        with open(options.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=1, sort_keys=True)
+            file.write("\n")
+        print(f"baseline saved to {options.baseline}")
+        return 0
+    regressions = compare(results, baseline, options.threshold, options.speed)
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {options.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
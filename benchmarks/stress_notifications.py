@@ -0,0 +1,120 @@
+"""Stress BleCentral's notification path with a fake characteristic source.
+
+A source calls BleCentral.update_ftms_value on fake characteristics at `rate` treadmill samples/s,
+every sample split into a "more data" notification (distance) and a speed notification as some
+treadmills send them, plus a status change every second. The consumer drains the central's buffer
+only every `drain_interval` ms, as a busy event loop would. PySide6 is replaced by fake_qt, so the
+central is the real class with the real buffer and dispatch but without a controller. Prints the
+counters and checks that every notification is accounted for, no status change is lost, both halves
+of a sample are delivered and neither goes backwards.
+Run from the repository root: python benchmarks/stress_notifications.py [rate] [seconds]
+"""
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_qt  # noqa: E402
+
+fake_qt.install()
+
+import central  # noqa: E402
+from PySide6.QtCore import QByteArray  # noqa: E402
+
+MORE_DATA_HALF = 0x0005  # more data, total distance
+SPEED_HALF = 0x0000  # instantaneous speed
+
+
+class FakeCharacteristic:
+    def __init__(self, uuid):
+        self._uuid = uuid
+
+    def uuid(self):
+        return self._uuid
+
+
+class CollectingBus:
+    # the parts of event_bus.EventBus BleCentral publishes to
+    def __init__(self):
+        self.samples = {MORE_DATA_HALF: [], SPEED_HALF: []}  # sequence numbers per half
+        self.statuses = 0
+
+    def publish_treadmill_data(self, data, trace=None):
+        flags, value = struct.unpack_from('<HH', data)
+        self.samples[flags].append(value)
+
+    def publish_status(self, data):
+        self.statuses += 1
+
+    def publish_training_status(self, data):
+        pass
+
+    def publish_log(self, source, text):
+        pass
+
+    def publish_connection_state(self, link, connected):
+        pass
+
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    drain_interval = 0.05
+
+    bus = CollectingBus()
+    backend = central.BleCentral(bus)
+    treadmill_data = FakeCharacteristic(central.TREADMILL_DATA_UUID)
+    ftms_status = FakeCharacteristic(central.FTMS_STATUS_UUID)
+    statuses_sent = 0
+    push_ns = 0
+    drains = 0
+    drains_with_both = 0
+
+    start = time.monotonic()
+    next_push = start
+    next_drain = start + drain_interval
+    sample = 0
+    while True:
+        now = time.monotonic()
+        if now - start > seconds:
+            break
+        if now >= next_push:
+            distance = QByteArray(struct.pack('<HHB', MORE_DATA_HALF, sample & 0xFFFF, 0))
+            speed = QByteArray(struct.pack('<HH', SPEED_HALF, sample & 0xFFFF))
+            push_start = time.perf_counter_ns()
+            backend.update_ftms_value(treadmill_data, distance)
+            backend.update_ftms_value(treadmill_data, speed)
+            if sample % rate == 0:
+                backend.update_ftms_value(ftms_status, QByteArray(b'\x04'))
+                statuses_sent += 1
+            push_ns += time.perf_counter_ns() - push_start
+            sample += 1
+            next_push += 1 / rate
+        if now >= next_drain:
+            halves = [len(values) for values in bus.samples.values()]
+            backend.dispatch_notifications()
+            grown = [len(values) > count for values, count in zip(bus.samples.values(), halves)]
+            drains += any(grown)
+            drains_with_both += all(grown)
+            next_drain += drain_interval
+        time.sleep(max(0.0, min(next_push, next_drain) - time.monotonic()))
+    backend.dispatch_notifications()
+
+    counters = backend.notifications.counters()
+    total = counters["delivered"] + counters["coalesced"] + counters["dropped"] + counters["pending"]
+    print(f"pushed {sample} treadmill samples at {sample / seconds:.0f}/s in two halves each, "
+          f"{statuses_sent} status changes")
+    print(counters)
+    print(f"update_ftms_value cost {push_ns / counters['received']:.0f} ns, status changes delivered "
+          f"{bus.statuses}, drains with both halves {drains_with_both}/{drains}")
+    assert total == counters["received"], "counters do not add up"
+    assert bus.statuses == statuses_sent, "status change lost"
+    assert drains_with_both == drains, "a half of a split sample was coalesced away"
+    for values in bus.samples.values():
+        assert values == sorted(values), "treadmill data went backwards"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Headless BLE bridge: FTMS treadmill -> ANT+ stride sensor and BLE peripheral, without QtWidgets.
+
+Options come from the command line or from the [bridge] section of a config file given with
+--config, command line arguments win. Example config:
+
+    [bridge]
+    treadmill_adapter = 00:1A:7D:DA:71:13
+    peripheral_adapter = 00:1A:7D:DA:71:14
+    log_file = /var/log/ble-bridge.log
+    record = /var/lib/ble-bridge/session.ftmslog
+    device_cache = /var/lib/ble-bridge/devices.json
+"""
+import argparse
+import configparser
+import logging
+from logging.handlers import RotatingFileHandler
+import signal
+import socket
+import sys
+
+from PySide6.QtCore import QCoreApplication, QLoggingCategory, QObject, QSocketNotifier, QTimer
+from PySide6.QtBluetooth import QBluetoothAddress, QBluetoothLocalDevice
+
+import antstride
+import central
+import fake_ant
+import peripheral
+import simulated_treadmill
+from device_cache import DEFAULT_PATH, KnownDeviceCache
+from event_bus import EventBus
+from multi_discovery import ParallelDiscovery
+from ftms_data import decode_treadmill_data, encode_treadmill_data, TreadmillData
+from sample_pipeline import build_pipeline
+from session_log import SessionRecorder
+from startup_profile import startup_report
+from supervisor import ConnectionSupervisor, CONNECTED
+from tracing import Tracer, GUI
+from workout import load_workout, WorkoutExecutor
+
+log = logging.getLogger("bridge")
+
+OPTIONS = {  # name: (type, default)
+    "treadmill_adapter": (str, None),
+    "peripheral_adapter": (str, None),
+    "no_peripheral": (bool, False),
+    "fanout": (bool, False),
+    "all_adapters": (bool, False),
+    "simulate": (float, None),
+    "fake_ant": (bool, False),
+    "ant_fec": (bool, False),
+    "record": (str, None),
+    "workout": (str, None),
+    "speed_factor": (float, 1.0),
+    "distance_factor": (float, 1.0),
+    "spike_limit": (float, 3.0),
+    "smoothing": (int, 0),
+    "device_cache": (str, DEFAULT_PATH),
+    "trace": (bool, False),
+    "log_file": (str, None),
+    "log_level": (str, "INFO"),
+    "log_max_bytes": (int, 1 << 20),
+    "log_backups": (int, 5),
+    "qt_bluetooth_log": (bool, False),
+    "reconnect_delay": (int, 2000),
+    "reconnect_max_delay": (int, 60000),
+    "exit_after_startup": (bool, False),
+}
+
+
+class HeadlessBridge(QObject):
+    def __init__(self, options, workout=None, parent=None):
+        super(HeadlessBridge, self).__init__(parent)
+        self.options = options
+        self.bus = EventBus(self)
+        self.tracer = Tracer() if options.trace else None
+        self.recorder = SessionRecorder(options.record) if options.record else None
+        self.known_devices = KnownDeviceCache(options.device_cache) if options.device_cache else None
+        self.values = TreadmillData()
+        self.pipeline = build_pipeline(options.speed_factor, options.distance_factor, options.spike_limit,
+                                       options.smoothing)
+
+        self.central = None
+        self.peripheral = None
+        self.ant = None
+        self.running = False
+        self.ftms_connected = False
+        self.discovery = None
+        self.found_device = None  # QBluetoothDeviceInfo of the treadmill the adapter discovery found
+        self.workout = workout  # workout.load_workout segments, run once the treadmill is connected
+        self.executor = None
+
+        self.bus.treadmill_data.connect(self.ftms_td)
+        self.bus.status.connect(self.ftms_st)
+        self.bus.training_status.connect(self.ftms_ts)
+        self.bus.control_point.connect(self.control_point)
+        self.bus.log.connect(log.info)
+
+        # headless, so every link retries forever, backing off up to reconnect_max_delay
+        backoff = {"initial_delay": options.reconnect_delay, "max_delay": options.reconnect_max_delay}
+        self.supervisor = ConnectionSupervisor(self.bus, parent=self)
+        self.central_link = self.supervisor.add("central", self.start_central, self.stop_central, **backoff)
+        self.peripheral_link = self.supervisor.add("peripheral", self.start_peripheral, self.stop_peripheral,
+                                                   **backoff)
+        self.ant_link = self.supervisor.add("ant", self.start_ant, self.stop_ant, **backoff)
+        self.supervisor.state_changed.connect(self.link_state)
+
+        adapters = [adapter.address().toString() for adapter in QBluetoothLocalDevice.allDevices()]
+        self.adapters = adapters
+        self.treadmill_adapter = options.treadmill_adapter or (adapters[0] if adapters else None)
+        self.peripheral_adapter = options.peripheral_adapter
+        if self.peripheral_adapter is None and not options.no_peripheral:
+            spare = [address for address in adapters if address != self.treadmill_adapter]
+            self.peripheral_adapter = spare[0] if spare else None
+
+    def start(self):
+        if self.treadmill_adapter is None and self.options.simulate is None:
+            log.error("No Bluetooth adapter for the treadmill")
+            QCoreApplication.exit(1)
+            return
+        self.running = True
+        if (self.options.all_adapters and self.options.simulate is None and len(self.adapters) > 1
+                and not self.options.treadmill_adapter):
+            self.discovery = ParallelDiscovery(self.adapters, bus=self.bus, parent=self)
+            self.discovery.finished.connect(self.adapters_chosen)
+            self.discovery.start()
+        else:
+            self.start_links()
+
+    def adapters_chosen(self, treadmill, peripheral, device):
+        if treadmill:
+            self.found_device = device
+            self.treadmill_adapter = treadmill
+            if not self.options.no_peripheral:
+                self.peripheral_adapter = peripheral or None
+        if self.running:
+            self.start_links()
+
+    def start_links(self):
+        log.info("Treadmill adapter %s, peripheral adapter %s", self.treadmill_adapter, self.peripheral_adapter)
+        self.central = self.create_central()
+        self.ant_link.start()
+        self.central_link.start()
+
+    def create_central(self):
+        if self.options.simulate is not None:
+            return simulated_treadmill.SimulatedTreadmill(bus=self.bus, data_rate=self.options.simulate,
+                                                          tracer=self.tracer)
+        # the treadmill the adapter discovery found, handed to the central once so it does not scan again
+        kwargs = {"device": self.found_device}
+        self.found_device = None
+        if self.peripheral_adapter is not None:
+            kwargs["blacklist_address"] = QBluetoothAddress(self.peripheral_adapter)
+        return central.BleCentral(local_device=QBluetoothAddress(self.treadmill_adapter), bus=self.bus,
+                                  recorder=self.recorder, tracer=self.tracer, known_devices=self.known_devices,
+                                  **kwargs)
+
+    def start_central(self):
+        self.central.run()
+
+    def stop_central(self):
+        self.central.stop()
+
+    def start_peripheral(self):
+        if self.options.fanout:
+            adapters = [QBluetoothAddress(address) for address in self.adapters if address != self.treadmill_adapter]
+            self.peripheral = peripheral.PeripheralFanout(adapters, bus=self.bus, recorder=self.recorder,
+                                                          tracer=self.tracer)
+        else:
+            self.peripheral = peripheral.FtmsPeripheral(local_device=QBluetoothAddress(self.peripheral_adapter),
+                                                        bus=self.bus, recorder=self.recorder, tracer=self.tracer)
+        self.peripheral.run()
+
+    def stop_peripheral(self):
+        self.peripheral.stop()
+        self.peripheral = None
+
+    def start_ant(self):
+        if self.options.fake_ant:
+            node_factory = fake_ant.FakeNode
+        else:
+            node_factory = None  # openant
+        self.ant = antstride.AntSend(bus=self.bus, node_factory=node_factory, tracer=self.tracer,
+                                     fitness_equipment=self.options.ant_fec)
+        self.ant.start()
+
+    def stop_ant(self):
+        self.ant.stop()
+
+    def ftms_td(self, data, trace=None):
+        # trace: the one the sample arrived with, not the tracer's newest (samples coalesce or split)
+        if self.tracer is not None and trace is not None:
+            self.tracer.stamp(GUI, trace)
+        try:
+            decode_treadmill_data(data, self.values)
+        except ValueError as e:
+            log.warning("%s", e)
+            return
+        sample = self.pipeline.process(self.values)
+        if self.peripheral is not None:
+            self.peripheral.ftms_value = encode_treadmill_data(sample)
+        self.ant.update_state(sample.speed / 360,  # m/s
+                              sample.total_distance,
+                              sample.total_energy,
+                              sample.inclination / 10,  # %
+                              sample.heart_rate,
+                              trace=trace)
+
+    def ftms_st(self, data):
+        if self.peripheral is not None:
+            self.peripheral.ftms_status = data
+
+    def ftms_ts(self, data):
+        if self.peripheral is not None:
+            self.peripheral.training_status = data
+
+    def control_point(self, data):
+        self.central.update_ftms(data)
+
+    def link_state(self, link, state):
+        # the peripheral starts with the first FTMS connection and then lives on its own
+        if link == "central" and state == CONNECTED and not self.ftms_connected:
+            self.ftms_connected = True
+            if self.peripheral_adapter is not None:
+                self.peripheral_link.start()
+            if self.workout and self.executor is None:
+                self.start_workout()
+
+    def start_workout(self):
+        self.executor = WorkoutExecutor(self.workout, self.central.update_ftms, self.bus, parent=self)
+        self.executor.segment_started.connect(
+            lambda index: log.info("Workout segment %d/%d: %s", index + 1, len(self.workout), self.workout[index]))
+        self.executor.finished.connect(lambda: log.info("Workout finished\n%s", self.executor.report()))
+        self.executor.start()
+
+    def stop(self):
+        self.running = False
+        if self.discovery is not None:
+            self.discovery.stop()
+        self.supervisor.stop()
+        log.info("Links:\n%s", self.supervisor.report())
+        if self.executor is not None:
+            self.executor.stop()
+            log.info("Workout:\n%s", self.executor.report())
+        if self.recorder is not None:
+            self.recorder.close()
+        log.info("Samples: %s", self.pipeline.report())
+        log.info("Events: %s", self.bus.stats())
+        if self.tracer is not None:
+            log.info("%s", self.tracer.dump())
+
+
+def load_options(argv):
+    parser = argparse.ArgumentParser(description="Headless BLE bridge - FTMS treadmill to ANT+ and BLE")
+    parser.add_argument("--config", metavar="FILE", help="read options from the [bridge] section of FILE")
+    parser.add_argument("--treadmill-adapter", metavar="ADDRESS", help="adapter connecting to the treadmill")
+    parser.add_argument("--peripheral-adapter", metavar="ADDRESS", help="adapter serving the BLE peripheral")
+    parser.add_argument("--fanout", action="store_true", default=None,
+                        help="run the BLE peripheral on every adapter but the treadmill's, one client each")
+    parser.add_argument("--no-peripheral", action="store_true", default=None, help="do not run a BLE peripheral")
+    parser.add_argument("--all-adapters", action="store_true", default=None,
+                        help="discover on all adapters, the one hearing the treadmill best connects to it")
+    parser.add_argument("--simulate", metavar="RATE", type=float, nargs="?", const=1.0,
+                        help="use a simulated treadmill sending RATE notifications/s (default 1)")
+    parser.add_argument("--fake-ant", action="store_true", default=None,
+                        help="run the ANT+ channel on an in-process fake node")
+    parser.add_argument("--ant-fec", action="store_true", default=None,
+                        help="also broadcast an ANT+ FE-C treadmill channel")
+    parser.add_argument("--record", metavar="FILE", help="append raw notifications to a session log")
+    parser.add_argument("--speed-factor", metavar="F", type=float, help="belt calibration factor for speed (1)")
+    parser.add_argument("--distance-factor", metavar="F", type=float, help="belt calibration factor for distance (1)")
+    parser.add_argument("--spike-limit", metavar="KMH", type=float,
+                        help="hold speed jumps above KMH per sample until confirmed, 0 = off (3)")
+    parser.add_argument("--smoothing", metavar="N", type=int, help="average the speed over N samples (off)")
+    parser.add_argument("--workout", metavar="FILE", help="run the JSON segment list in FILE once connected")
+    parser.add_argument("--device-cache", metavar="FILE",
+                        help="remember the last treadmill to reconnect without scanning ('' = always scan)")
+    parser.add_argument("--trace", action="store_true", default=None, help="trace latency, logged on exit")
+    parser.add_argument("--log-file", metavar="FILE", help="log to FILE instead of stderr")
+    parser.add_argument("--log-level", metavar="LEVEL", help="DEBUG, INFO (default), WARNING, ...")
+    parser.add_argument("--log-max-bytes", metavar="N", type=int, help="rotate the log file at N bytes (1 MB)")
+    parser.add_argument("--log-backups", metavar="N", type=int, help="rotated log files to keep (5)")
+    parser.add_argument("--qt-bluetooth-log", action="store_true", default=None,
+                        help="enable Qt's qt.bluetooth debug logging")
+    parser.add_argument("--reconnect-delay", metavar="MS", type=int, help="first delay before reconnecting (2000)")
+    parser.add_argument("--reconnect-max-delay", metavar="MS", type=int,
+                        help="longest delay between reconnects, doubling from --reconnect-delay (60000)")
+    parser.add_argument("--exit-after-startup", action="store_true", default=None,
+                        help="log startup time and memory, then exit")
+    options = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    if options.config:
+        if not config.read(options.config):
+            parser.error(f"cannot read config file {options.config}")
+    section = config["bridge"] if config.has_section("bridge") else {}
+    for name, (kind, default) in OPTIONS.items():
+        if getattr(options, name) is not None:
+            continue
+        if name in section:
+            value = config.getboolean("bridge", name) if kind is bool else kind(section[name])
+        else:
+            value = default
+        setattr(options, name, value)
+    return options
+
+
+def main(argv=None):
+    options = load_options(sys.argv[1:] if argv is None else argv)
+    handlers = None
+    if options.log_file:
+        handlers = [RotatingFileHandler(options.log_file, maxBytes=options.log_max_bytes,
+                                        backupCount=options.log_backups, encoding="utf-8")]
+    logging.basicConfig(handlers=handlers, level=options.log_level.upper(),
+                        format="%(asctime)s %(levelname)s %(message)s")
+    if options.qt_bluetooth_log:
+        QLoggingCategory.setFilterRules("qt.bluetooth* = true")
+
+    workout = None
+    if options.workout:
+        try:
+            workout = load_workout(options.workout)
+        except (OSError, ValueError) as e:
+            log.error("Cannot load workout: %s", e)
+            return 1
+
+    app = QCoreApplication(sys.argv[:1])
+    bridge = HeadlessBridge(options, workout=workout)
+    app.aboutToQuit.connect(bridge.stop)
+
+    # SIGINT/SIGTERM wake the event loop through a socket instead of a polling timer
+    wakeup_read, wakeup_write = socket.socketpair()
+    wakeup_write.setblocking(False)
+    signal.set_wakeup_fd(wakeup_write.fileno())
+    signal.signal(signal.SIGINT, lambda *args: None)
+    signal.signal(signal.SIGTERM, lambda *args: None)
+    notifier = QSocketNotifier(wakeup_read.fileno(), QSocketNotifier.Type.Read)
+    notifier.activated.connect(lambda: (wakeup_read.recv(64), app.quit()))
+
+    def started():
+        log.info("%s", startup_report("headless"))
+        if options.exit_after_startup:
+            app.quit()
+
+    if not options.exit_after_startup:
+        bridge.start()
+    QTimer.singleShot(0, started)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,59 +2,52 @@ import time
 
 from PySide6.QtBluetooth import (QBluetoothUuid,
                                  QBluetoothAddress,
+                                 QBluetoothDeviceInfo,
                                  QLowEnergyController,
                                  QLowEnergyDescriptor,
                                  QLowEnergyService,
 
                                  QBluetoothDeviceDiscoveryAgent,
                                  QLowEnergyConnectionParameters)
-from PySide6.QtCore import QByteArray, Signal, QThread, QLoggingCategory
-
-
-class WriteEmitter(QThread):
-    ftms_td_signal = Signal(bytearray)
-    ftms_st_signal = Signal(bytearray)
-    ftms_ts_signal = Signal(bytearray)
-    ftms_co_signal = Signal(bool)
-    central_output = Signal(str)
-
-    def __init__(self, parent=None,
-                 runner=False):
-        super(WriteEmitter, self).__init__(parent)
-        self.runner = runner
-
-    def run(self):
-        while self.runner:
-            QThread.msleep(200)
-            # pass
-
-    def emit_ftms_td_signal(self, data):
-        self.ftms_td_signal.emit(data)
-
-    def emit_ftms_st_signal(self, data):
-        self.ftms_st_signal.emit(data)
-
-    def emit_ftms_ts_signal(self, data):
-        self.ftms_ts_signal.emit(data)
-
-    def emit_ftms_co_signal(self, data):
-        self.ftms_co_signal.emit(data)
-
-    def emit_central_output(self, data):
-        output = "Central: " + data
-        self.central_output.emit(output)
-
-    def stop(self):
-        self.runner = False
-
-
-class BleCentral:
-    QLoggingCategory.setFilterRules("qt.bluetooth* = true")
-
-    def __init__(self, local_device=None, **kwargs):
-        super(BleCentral, self).__init__()
+from PySide6.QtCore import QByteArray, QTimer
+
+from control_point import ControlPointQueue
+from device_cache import PUBLIC, RANDOM
+from ftms_data import treadmill_flags
+from notification_buffer import NotificationBuffer, COALESCE
+from treadmill_backend import TreadmillBackend
+
+TREADMILL_DATA = 0x2ACD
+FTMS_STATUS = 0x2ADA
+TRAINING_STATUS = 0x2AD3
+TREADMILL_DATA_UUID = QBluetoothUuid(TREADMILL_DATA)
+FTMS_STATUS_UUID = QBluetoothUuid(FTMS_STATUS)
+TRAINING_STATUS_UUID = QBluetoothUuid(TRAINING_STATUS)
+
+
+class BleCentral(TreadmillBackend):
+    def __init__(self, bus, local_device=None, recorder=None, tracer=None, known_devices=None,
+                 direct_timeout=5000, device=None, **kwargs):
+        super(BleCentral, self).__init__(bus, tracer)
+        self.recorder = recorder
         self.blacklist_address = kwargs.get('blacklist_address', None)
-        self.remote_devices = []
+        self.remote_devices = {}  # address: QBluetoothDeviceInfo of the running scan
+        # device_cache.KnownDeviceCache; with a known treadmill run() connects without scanning and
+        # only scans if that fails within `direct_timeout` ms. None = always scan.
+        self.known_devices = known_devices
+        # QBluetoothDeviceInfo a discovery already found (multi_discovery.ParallelDiscovery), connected
+        # to directly by the first run(), like a known treadmill
+        self.found_device = device
+        self.connect_path = "scan"
+        self.adapter = local_device.toString() if local_device is not None else None
+        self.direct_connect = False
+        self.direct_timer = QTimer()
+        self.direct_timer.setSingleShot(True)
+        self.direct_timer.setInterval(direct_timeout)
+        self.direct_timer.timeout.connect(self.direct_connect_failed)
+        self.connect_started = 0.0
+        # ms from run() to the FTMS service being ready, per way the treadmill was found
+        self.connect_times = {"discovery": [], "cached": [], "scan": []}
         self.ftms_device = ""
         self.local_device = local_device
 
@@ -79,11 +72,66 @@ class BleCentral:
         self.connection_parameters.setLatency(300)
         self.connection_parameters.setSupervisionTimeout(14500)
 
-        self.emitter = WriteEmitter(parent=None, runner=True)
+        self.commands = ControlPointQueue(self.write_control_point)
+        self.commands.command_finished.connect(self.command_finished)
+
+        # Notifications are buffered and dispatched from the event loop. Treadmill data coalesces
+        # to the newest sample per flags word, so both halves of a split sample reach the decoder;
+        # status changes are queued and only dropped if the buffer is full.
+        self.notifications = NotificationBuffer(max_depth=32, policies={TREADMILL_DATA: COALESCE},
+                                                variants={TREADMILL_DATA: treadmill_flags})
+        self.dispatchers = {TREADMILL_DATA: self.bus.publish_treadmill_data,
+                            FTMS_STATUS: self.bus.publish_status,
+                            TRAINING_STATUS: self.bus.publish_training_status}
 
     def run(self):
-        # self.device_handler.set_device(None)
-        self.emitter.start()
+        self.connect_started = time.monotonic()
+        device, self.found_device = self.found_device, None
+        known = self.known_devices.get(self.adapter) if self.known_devices is not None else None
+        if device is not None:
+            self.connect_found(device)
+        elif known is not None:
+            self.connect_known(known)
+        else:
+            self.scan()
+
+    def connect_found(self, device):
+        self.bus.publish_log("Central", f"Connecting to discovered treadmill {device.name()} "
+                                        f"{device.address().toString()}")
+        self.connect_path = "discovery"
+        self.direct_connect = True
+        self.direct_timer.start()
+        self.set_device(device)
+
+    def connect_known(self, known):
+        self.bus.publish_log("Central", f"Connecting to known treadmill {known['name']} {known['address']}")
+        self.connect_path = "cached"
+        device = QBluetoothDeviceInfo(QBluetoothAddress(known["address"]), known["name"], 0)
+        device.setCoreConfigurations(QBluetoothDeviceInfo.CoreConfiguration.LowEnergyCoreConfiguration)
+        self.direct_connect = True
+        self.direct_timer.start()
+        if known["address_type"] == RANDOM:
+            self.set_device(device, QLowEnergyController.RemoteAddressType.RandomAddress)
+        else:
+            self.set_device(device, QLowEnergyController.RemoteAddressType.PublicAddress)
+
+    def direct_connect_failed(self):
+        # the known treadmill did not answer (switched off, other address, ...): fall back to a scan
+        if not self.direct_connect:
+            return
+        self.direct_connect = False
+        self.direct_timer.stop()
+        self.bus.publish_log("Central", f"Treadmill ({self.connect_path}) not reachable, scanning")
+        if self.m_control:
+            # the failed attempt is not a disconnect the bridge has to react to
+            self.m_control.disconnected.disconnect(self.controller_disconnected)
+            self.m_control.errorOccurred.disconnect(self.error_occurred)
+        self.disconnect_service()
+        self.scan()
+
+    def scan(self):
+        self.connect_path = "scan"
+        self.remote_devices = {}
         self.device_discovery_agent = QBluetoothDeviceDiscoveryAgent(self.local_device)
         self.device_discovery_agent.setLowEnergyDiscoveryTimeout(4000)
         self.device_discovery_agent.deviceDiscovered.connect(self.add_device)
@@ -93,20 +141,23 @@ class BleCentral:
         self.device_discovery_agent.start(QBluetoothDeviceDiscoveryAgent.LowEnergyMethod)
 
     def error_occurred(self, error):
-        self.emitter.emit_central_output(f"Discovery Error occurred: {error} - {self.m_control.errorString()} "
-                                         f"- {self.device_discovery_agent.errorString()}")
+        if self.direct_connect:
+            self.direct_connect_failed()
+            return
+        self.bus.publish_log("Central", f"Discovery Error occurred: {error} - {self.m_control.errorString()} "
+                                        f"- {self.device_discovery_agent.errorString()}")
         if error == self.m_control.Error.ConnectionError:
-            self.emitter.emit_ftms_co_signal(False)
+            self.bus.publish_connection_state("central", False)
 
     def add_device(self, device):
         if QBluetoothAddress(device.address()) == QBluetoothAddress(self.blacklist_address):
             return
-        self.remote_devices.append(device)
+        # the agent reports a device again when its advertisement changes, keep the newest info
+        self.remote_devices[device.address().toString()] = device
 
-        for services in device.serviceUuids():
-            if services == QBluetoothUuid(0x1826):
-                self.device_discovery_agent.stop()
-                self.scan_finished()
+        if QBluetoothUuid(0x1826) in device.serviceUuids():
+            self.device_discovery_agent.stop()
+            self.scan_finished()
 
     def scan_finished(self):
         self.device_discovery_agent.stop()
@@ -114,33 +165,25 @@ class BleCentral:
         ftms_found = False
         if self.remote_devices:
             print(f"Found BT devices: {len(self.remote_devices)}")
-            for device in self.remote_devices:
-                print(f"d {device.address()} b {self.blacklist_address}")
-                for services in device.serviceUuids():
-                    if services == QBluetoothUuid(0x1826):
-                        self.connect_to_service(device.address())
-                        ftms_found = True
+            for device in self.remote_devices.values():
+                if QBluetoothUuid(0x1826) in device.serviceUuids():
+                    self.connect_to_service(device.address())
+                    ftms_found = True
+                    break
             if not ftms_found:
-                self.emitter.emit_central_output("FTMS device not found.")
-                self.emitter.emit_ftms_co_signal(False)
+                self.bus.publish_log("Central", "FTMS device not found.")
+                self.bus.publish_connection_state("central", False)
         else:
-            self.emitter.emit_central_output("No BT devices found.")
+            self.bus.publish_log("Central", "No BT devices found.")
 
     def connect_to_service(self, address):
         self.device_discovery_agent.stop()
 
-        current_device = None
-        for entry in self.remote_devices:
-            device = entry
-
-            if device and device.address() == address:
-                current_device = device
-                break
-
+        current_device = self.remote_devices.get(address.toString())
         if current_device:
             self.set_device(current_device)
 
-    def set_device(self, device):
+    def set_device(self, device, address_type=None):
         print("Setting device...")
         self.m_currentDevice = device
 
@@ -157,7 +200,8 @@ class BleCentral:
             print(self.m_currentDevice.address())
             self.m_control = QLowEnergyController.createCentral(self.m_currentDevice, self.local_device)
             # [Connect-Signals-1]
-            # self.m_control.setRemoteAddressType(self.m_addressType)
+            if address_type is not None:
+                self.m_control.setRemoteAddressType(address_type)
 
             self.m_control.serviceDiscovered.connect(self.service_discovered)
             self.m_control.discoveryFinished.connect(self.service_scan_done)
@@ -168,9 +212,9 @@ class BleCentral:
             # Connect
             if self.m_control.state() == QLowEnergyController.UnconnectedState:
                 self.m_control.connectToDevice()
-                self.emitter.emit_central_output("Connecting to " + self.m_currentDevice.address().toString())
+                self.bus.publish_log("Central", "Connecting to " + self.m_currentDevice.address().toString())
             else:
-                self.emitter.emit_central_output("LE Controller wrong state")
+                self.bus.publish_log("Central", "LE Controller wrong state")
 
     def service_scan_done(self):
 
@@ -190,13 +234,23 @@ class BleCentral:
             # self.m_service.descriptorWritten.connect(self.confirmed_descriptor_write)
             self.m_service.discoverDetails()
         else:
-            self.emitter.emit_central_output("FTMS Service not found.")
+            self.bus.publish_log("Central", "FTMS Service not found.")
 
-    def update_ftms(self, value):
+    def update_ftms(self, value, pace=None):
+        # queue a control point command, `pace` ms (default 100) pass before the next one is written
+        return self.commands.put(value, pace)
+
+    def write_control_point(self, value):
         if self.m_service is not None and self.control_point_char is not None:
             self.m_service.writeCharacteristic(self.control_point_char, QByteArray(value),
                                                QLowEnergyService.WriteMode.WriteWithoutResponse)
-            time.sleep(0.1)
+            return True
+        return False
+
+    def command_finished(self, command_id, written, latency):
+        if not written:
+            self.bus.publish_log("Central", f"Control point command {command_id} dropped "
+                                            f"after {latency:.0f} ms")
 
     def service_state_changed(self, switch):
         if switch == QLowEnergyService.RemoteServiceDiscovering:
@@ -231,28 +285,50 @@ class BleCentral:
                     self.control_point_char = self.m_service.characteristic(
                         QBluetoothUuid(0x2AD9))
                     self.m_service.characteristicWritten.connect(self.write_success)
-            self.emitter.emit_ftms_co_signal(True)
-            self.emitter.emit_central_output("Connected")
+            self.connection_ready()
+
+    def connection_ready(self):
+        path = self.connect_path
+        self.direct_connect = False
+        self.direct_timer.stop()
+        elapsed = (time.monotonic() - self.connect_started) * 1000
+        self.connect_times[path].append(elapsed)
+        if self.known_devices is not None:
+            if self.m_control.remoteAddressType() == QLowEnergyController.RemoteAddressType.RandomAddress:
+                address_type = RANDOM
+            else:
+                address_type = PUBLIC
+            self.known_devices.remember(self.adapter, self.m_currentDevice.address().toString(), address_type,
+                                        self.m_currentDevice.name())
+        self.bus.publish_connection_state("central", True)
+        self.bus.publish_log("Central", f"Connected in {elapsed:.0f} ms ({path})")
 
     def update_ftms_value(self, c, value):
         # ignore any other characteristic change. Shouldn't really happen though
-
-        # if c.uuid() != QBluetoothUuid(QBluetoothUuid.CharacteristicType.HeartRateMeasurement):
-        #    return
-
-        # data = value.data()
-        # flags = int(data[0])
-        if c.uuid() == QBluetoothUuid(0x2ACD):
-            # FTMS Data
-            ftms_value = value.data()
-            self.emitter.emit_ftms_td_signal(ftms_value)
-        elif c.uuid() == QBluetoothUuid(0x2ADA):
-            ftms_status = value.data()
-            self.emitter.emit_ftms_st_signal(ftms_status)
-        elif c.uuid() == QBluetoothUuid(0x2AD3):
-            training_status = value.data()
-            self.emitter.emit_ftms_ts_signal(training_status)
-        time.sleep(0.05)
+        uuid = c.uuid()
+        trace = None
+        if uuid == TREADMILL_DATA_UUID:
+            key = TREADMILL_DATA
+            if self.tracer is not None:
+                trace = self.tracer.arrived()
+        elif uuid == FTMS_STATUS_UUID:
+            key = FTMS_STATUS
+        elif uuid == TRAINING_STATUS_UUID:
+            key = TRAINING_STATUS
+        else:
+            return
+        data = value.data()
+        if self.recorder is not None:
+            self.recorder.record(key, data)
+        if self.notifications.push(key, data, trace):
+            QTimer.singleShot(0, self.dispatch_notifications)
+
+    def dispatch_notifications(self):
+        for key, data, trace in self.notifications.drain():
+            if trace is not None:
+                self.bus.publish_treadmill_data(data, trace)
+            else:
+                self.dispatchers[key](data)
 
     def confirmed_descriptor_write(self, d, value):
         if (d.isValid() and d == self.m_notificationDesc
@@ -263,6 +339,7 @@ class BleCentral:
 
     def disconnect_service(self):
         self.m_foundFtmsService = False
+        self.commands.clear()
 
         if self.m_control:
             self.m_control.disconnectFromDevice()
@@ -272,7 +349,10 @@ class BleCentral:
         self.m_control.discoverServices()
 
     def controller_disconnected(self):
-        self.emitter.emit_ftms_co_signal(False)
+        if self.direct_connect:
+            self.direct_connect_failed()
+            return
+        self.bus.publish_connection_state("central", False)
 
     def service_discovered(self, gatt):
         if gatt == QBluetoothUuid(0x1826):
@@ -283,5 +363,19 @@ class BleCentral:
         # print("write success")
 
     def stop(self):
-        self.emitter.stop()
+        counters = self.notifications.counters()
+        self.bus.publish_log("Central", f"Notifications: {counters['received']} received, "
+                                        f"{counters['delivered']} delivered, {counters['coalesced']} coalesced, "
+                                        f"{counters['dropped']} dropped")
+        stats = self.commands.latency_stats()
+        if stats["written"] or stats["failed"]:
+            self.bus.publish_log("Central", f"Control point: {stats['written']} written, {stats['failed']} failed, "
+                                            f"latency mean {stats['latency_mean_ms']:.1f} ms, "
+                                            f"max {stats['latency_max_ms']:.1f} ms")
+        for path, times in self.connect_times.items():
+            if times:
+                self.bus.publish_log("Central", f"Connect via {path}: {len(times)}x, "
+                                                f"mean {sum(times) / len(times):.0f} ms, max {max(times):.0f} ms")
+        self.direct_connect = False
+        self.direct_timer.stop()
         self.disconnect_service()
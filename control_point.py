@@ -0,0 +1,78 @@
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class ControlPointQueue(QObject):
+    """Paced, non-blocking queue for FTMS control point writes.
+
+    Commands are written one at a time; the next one waits `pace` ms on a single-shot timer instead
+    of sleeping on the GUI thread. Commands older than `timeout` ms are dropped, a full queue
+    rejects new ones. command_finished(id, written, latency ms) reports every command, latency
+    being the time from put() to the write.
+    """
+    command_finished = Signal(int, bool, float)
+    drained = Signal()
+
+    def __init__(self, write, pace=100, timeout=2000, max_depth=16, parent=None):
+        super(ControlPointQueue, self).__init__(parent)
+        self.write = write
+        self.pace = pace
+        self.timeout = timeout
+        self.max_depth = max_depth
+        self.queue = deque()
+        self.next_id = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.process)
+
+        self.written = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def put(self, value, pace=None):
+        command_id = self.next_id
+        self.next_id += 1
+        if len(self.queue) >= self.max_depth:
+            self.failed += 1
+            self.command_finished.emit(command_id, False, 0.0)
+            return None
+        self.queue.append((command_id, bytes(value), time.monotonic(), pace))
+        if not self.timer.isActive():
+            self.process()
+        return command_id
+
+    def process(self):
+        while self.queue:
+            command_id, value, queued, pace = self.queue.popleft()
+            latency = (time.monotonic() - queued) * 1000
+            if latency > self.timeout:
+                self.failed += 1
+                self.command_finished.emit(command_id, False, latency)
+                continue
+            written = self.write(value)
+            if written:
+                self.written += 1
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+            else:
+                self.failed += 1
+            self.command_finished.emit(command_id, written, latency)
+            self.timer.start(self.pace if pace is None else pace)
+            return
+        self.drained.emit()
+
+    def pending(self):
+        return len(self.queue) + self.timer.isActive()
+
+    def latency_stats(self):
+        mean = self.latency_total / self.written if self.written else 0.0
+        return {"written": self.written, "failed": self.failed,
+                "latency_mean_ms": mean, "latency_max_ms": self.latency_max}
+
+    def clear(self):
+        self.queue.clear()
+        self.timer.stop()
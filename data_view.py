@@ -0,0 +1,85 @@
+import time
+
+# Labels of the treadmill data display, in display order
+FIELDS = ("speed", "pace", "distance", "time", "incline", "calories")
+INITIAL = ("0.0", "00:00", "0.0", "00:00:00", "0.0", "0")
+
+
+def format_pace(speed):
+    # speed in 0.01 km/h -> "m:ss" min/km
+    if not speed:
+        return "00:00"
+    seconds = 360000 // speed
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def format_time(seconds):
+    if seconds < 3600:
+        return f"{seconds // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class DataViewModel:
+    """Label texts of the data display, formatted only when their value changes.
+
+    update() takes every decoded TreadmillData record; a field is formatted again only if its raw
+    value differs from the one its text was made from (paces are memoized per speed). changes()
+    hands out the labels whose text differs from what is shown. delay() paces the repaints to at
+    most `max_rate` per second, 0 = every notification.
+    """
+
+    def __init__(self, max_rate=4.0):
+        self.texts = list(INITIAL)
+        self.shown = list(INITIAL)
+        self.values = [None] * len(FIELDS)  # raw value each text was formatted from
+        self.paces = {}
+        self.interval = 1 / max_rate if max_rate else 0.0
+        self.painted = 0.0
+
+        self.updates = 0
+        self.paints = 0
+        self.label_updates = 0
+
+    def update(self, record):
+        self.updates += 1
+        texts = self.texts
+        values = self.values
+        speed = record.speed
+        if speed != values[0]:
+            values[0] = speed
+            texts[0] = str(speed / 100)
+            pace = self.paces.get(speed)
+            if pace is None:
+                pace = self.paces[speed] = format_pace(speed)
+            texts[1] = pace
+        if record.total_distance != values[2]:
+            values[2] = record.total_distance
+            texts[2] = str(record.total_distance / 1000)
+        if record.elapsed_time != values[3]:
+            values[3] = record.elapsed_time
+            texts[3] = format_time(record.elapsed_time)
+        if record.inclination != values[4]:
+            values[4] = record.inclination
+            texts[4] = str(record.inclination / 10)
+        if record.total_energy != values[5]:
+            values[5] = record.total_energy
+            texts[5] = str(record.total_energy)
+
+    def delay(self, now=None):
+        # ms until the next repaint is due
+        if now is None:
+            now = time.monotonic()
+        return max(0, int((self.painted + self.interval - now) * 1000))
+
+    def changes(self, now=None):
+        # [(label index, text)] to set, marks them shown
+        self.painted = time.monotonic() if now is None else now
+        self.paints += 1
+        changed = []
+        shown = self.shown
+        for index, text in enumerate(self.texts):
+            if text != shown[index]:
+                shown[index] = text
+                changed.append((index, text))
+        self.label_updates += len(changed)
+        return changed
@@ -0,0 +1,47 @@
+import json
+import os
+
+# Last FTMS treadmill seen per local adapter, so BleCentral can connect without a discovery scan.
+#   {"<adapter address>": {"address": "...", "address_type": "public" | "random", "name": "..."}}
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".ble_bridge_devices.json")
+
+PUBLIC = "public"
+RANDOM = "random"
+
+
+class KnownDeviceCache:
+    """Small JSON file holding the last connected treadmill per adapter, written atomically."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.devices = {}
+        try:
+            with open(path) as file:
+                devices = json.load(file)
+            if isinstance(devices, dict):
+                self.devices = devices
+        except (OSError, ValueError):
+            pass
+
+    def get(self, adapter):
+        return self.devices.get(adapter or "default")
+
+    def remember(self, adapter, address, address_type=PUBLIC, name=""):
+        device = {"address": address, "address_type": address_type, "name": name}
+        if self.devices.get(adapter or "default") == device:
+            return
+        self.devices[adapter or "default"] = device
+        self.save()
+
+    def forget(self, adapter):
+        if self.devices.pop(adapter or "default", None) is not None:
+            self.save()
+
+    def save(self):
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, "w") as file:
+                json.dump(self.devices, file, indent=1)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"Cannot save known devices to {self.path}: {e}")
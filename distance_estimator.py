@@ -0,0 +1,86 @@
+NS = 1_000_000_000
+TRUNCATION = 0.999  # m, FTMS distance is whole metres, truncated: the true value is below distance + 1
+
+
+class DistanceEstimator:
+    """Distance between FTMS notifications, extrapolated from the last speed.
+
+    FTMS reports whole metres about once a second, ANT+ broadcasts about four times a second.
+    sample() takes every notification from any thread (it only replaces one tuple), estimate() runs
+    on the ANT thread once per TX event and is O(1):
+      - between samples the distance advances at the sampled speed, for at most `horizon` ns after
+        the sample, so a stalled link does not run away
+      - a new sample is reconciled, not jumped to: the prediction at the sample time is clamped
+        into [distance, distance + 1) and the difference to what is shown is spread over `blend` ns
+      - the estimate never decreases, an overshoot holds until the new line catches up
+      - a distance more than `reset` m below the previous sample is a treadmill reset (reconnect,
+        new session), the estimate restarts there
+    """
+
+    def __init__(self, blend=NS, horizon=3 * NS, reset=5):
+        self.blend = blend
+        self.horizon = horizon
+        self.reset = reset
+        self.latest = None  # (time ns, speed m/s, distance m), replaced whole by sample()
+        self.seen = None  # the sample the line was built from
+
+        # reference line: base m at base_time ns, advancing at speed m/s
+        self.base_time = 0
+        self.base = 0.0
+        self.speed = 0.0
+        self.correction = 0.0  # m the shown value is off the line, decays to 0 over blend
+        self.corrected_at = 0
+        self.last = 0.0  # last estimate handed out
+
+        self.samples = 0
+        self.resets = 0
+
+    def sample(self, now, speed, distance):
+        self.latest = (now, speed, distance)
+
+    def estimate(self, now):
+        latest = self.latest
+        if latest is None:
+            return 0.0
+        if latest is not self.seen:
+            self.reconcile(latest, now)
+        estimate = self.value(now)
+        if estimate < self.last:
+            return self.last
+        self.last = estimate
+        return estimate
+
+    def line(self, now):
+        return self.base + self.speed * min(now - self.base_time, self.horizon) / NS
+
+    def value(self, now):
+        # line plus what is left of the correction
+        value = self.line(now)
+        if self.correction:
+            left = self.corrected_at + self.blend - now
+            if left > 0:
+                value -= self.correction * left / self.blend
+            else:
+                self.correction = 0.0
+        return value
+
+    def reconcile(self, latest, now):
+        t, speed, distance = latest
+        previous, self.seen = self.seen, latest
+        self.samples += 1
+        if previous is None or distance < previous[2] - self.reset:
+            if previous is not None:
+                self.resets += 1
+            self.base_time, self.base, self.speed = t, float(distance), speed
+            self.correction = 0.0
+            self.last = float(distance)
+            return
+        shown = max(self.value(now), self.last)
+        predicted = self.line(t)
+        self.base_time, self.speed = t, speed
+        self.base = min(max(predicted, distance), distance + TRUNCATION)
+        self.correction = self.line(now) - shown
+        self.corrected_at = now
+
+    def counters(self):
+        return {"samples": self.samples, "resets": self.resets}
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from PySide6.QtCore import QObject, Signal
+
+TOPICS = ("treadmill_data", "status", "training_status", "control_point", "log", "connection_state")
+
+
+class EventBus(QObject):
+    """Single event bus between the central, the peripheral, the ANT sender and the GUI.
+
+    The bus belongs to the thread that creates it (the GUI thread). Publishing is allowed from any
+    thread: Qt delivers an event directly to subscribers living in the publishing thread and queues
+    it into the event loop of subscribers living in another one, so nothing polls or sleeps. Events
+    of one topic keep their order. The event counts are shared between the publishing threads (the
+    ANT node thread publishes too) and only changed under `count_lock`.
+    """
+    treadmill_data = Signal(bytes, object)  # 0x2ACD notification, its trace (tracing) or None
+    status = Signal(bytes)  # 0x2ADA notification
+    training_status = Signal(bytes)  # 0x2AD3 notification
+    control_point = Signal(bytes)  # 0x2AD9 write from the peripheral side
+    log = Signal(str)
+    connection_state = Signal(str, bool)  # link ("central", "peripheral", "ant"), connected
+
+    def __init__(self, parent=None):
+        super(EventBus, self).__init__(parent)
+        self.count_lock = threading.Lock()
+        self.counts = dict.fromkeys(TOPICS, 0)
+        self.rate_counts = dict(self.counts)
+        self.rate_time = time.monotonic()
+
+    def publish_treadmill_data(self, data, trace=None):
+        with self.count_lock:
+            self.counts["treadmill_data"] += 1
+        self.treadmill_data.emit(data, trace)
+
+    def publish_status(self, data):
+        with self.count_lock:
+            self.counts["status"] += 1
+        self.status.emit(data)
+
+    def publish_training_status(self, data):
+        with self.count_lock:
+            self.counts["training_status"] += 1
+        self.training_status.emit(data)
+
+    def publish_control_point(self, data):
+        with self.count_lock:
+            self.counts["control_point"] += 1
+        self.control_point.emit(data)
+
+    def publish_log(self, source, text):
+        with self.count_lock:
+            self.counts["log"] += 1
+        self.log.emit(source + ": " + text)
+
+    def publish_connection_state(self, link, connected):
+        with self.count_lock:
+            self.counts["connection_state"] += 1
+        self.connection_state.emit(link, connected)
+
+    def rates(self):
+        # events/s per topic since the previous call
+        now = time.monotonic()
+        elapsed = max(now - self.rate_time, 1e-9)
+        with self.count_lock:
+            counts = dict(self.counts)
+        rates = {topic: (counts[topic] - self.rate_counts[topic]) / elapsed for topic in TOPICS}
+        self.rate_counts = counts
+        self.rate_time = now
+        return rates
+
+    def stats(self):
+        rates = self.rates()
+        return ", ".join(f"{topic} {self.rate_counts[topic]} ({rates[topic]:.1f}/s)" for topic in TOPICS)
@@ -0,0 +1,117 @@
+import threading
+import time
+
+# In-process stand-in for openant.easy.node.Node, for running AntSend without an ANT+ stick.
+# FakeNode.start() calls every open channel's on_broadcast_tx_data once per channel period, like the
+# stick does, and each FakeChannel records what was broadcast and how late.
+
+ANT_CLOCK = 32768  # channel period unit, 1/32768 s
+
+
+class FakeChannel:
+    def __init__(self, node, number, channel_type, capture=True):
+        self.node = node
+        self.number = number
+        self.channel_type = channel_type
+        self.capture = capture
+        self.device = None
+        self.period = 8192
+        self.rf_freq = 57
+        self.is_open = False
+        self.on_broadcast_tx_data = None
+
+        self.broadcasts = []  # (monotonic time, payload)
+        self.slot = None  # scheduled time of the running TX event
+        self.sent_in_slot = False
+        self.slots = 0
+        self.missed = 0
+        self.latencies = []  # s from slot to send_broadcast_data
+        self.jitters = []  # s from slot to callback start
+
+    def set_id(self, device_number, device_type, transmission_type):
+        self.device = (device_number, device_type, transmission_type)
+
+    def set_period(self, period):
+        self.period = period
+
+    def set_rf_freq(self, rf_freq):
+        self.rf_freq = rf_freq
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def send_broadcast_data(self, data):
+        now = time.monotonic()
+        if any(not 0 <= value <= 255 for value in data):
+            raise OverflowError(f"payload byte out of range: {list(data)}")
+        if self.slot is not None:
+            self.latencies.append(now - self.slot)
+            self.sent_in_slot = True
+        if self.capture:
+            self.broadcasts.append((now, bytes(data)))
+
+    def stats(self):
+        def summary(values):
+            if not values:
+                return 0.0, 0.0, 0.0
+            ordered = sorted(values)
+            return (sum(ordered) / len(ordered) * 1e6, ordered[int(len(ordered) * 0.99)] * 1e6,
+                    ordered[-1] * 1e6)
+        latency = summary(self.latencies)
+        jitter = summary(self.jitters)
+        return {"slots": self.slots, "broadcasts": len(self.latencies), "missed": self.missed,
+                "latency_mean_us": latency[0], "latency_p99_us": latency[1], "latency_max_us": latency[2],
+                "jitter_mean_us": jitter[0], "jitter_p99_us": jitter[1], "jitter_max_us": jitter[2]}
+
+
+class FakeNode:
+    def __init__(self, capture=True):
+        self.capture = capture
+        self.channels = []
+        self.network_keys = {}
+        self.running = False
+        self.stopped = threading.Event()
+
+    def set_network_key(self, network, key):
+        self.network_keys[network] = key
+
+    def new_channel(self, channel_type, network_number=0x00, ext_assign=None):
+        channel = FakeChannel(self, len(self.channels), channel_type, capture=self.capture)
+        self.channels.append(channel)
+        return channel
+
+    def start(self):
+        # Blocks like openant's Node.start() until stop() is called.
+        self.running = True
+        start = time.monotonic()
+        next_slots = {channel: start + channel.period / ANT_CLOCK for channel in self.channels}
+        while self.running:
+            channel, slot = min(next_slots.items(), key=lambda item: item[1])
+            if self.stopped.wait(max(0.0, slot - time.monotonic())):
+                break
+            period = channel.period / ANT_CLOCK
+            if not channel.is_open or channel.on_broadcast_tx_data is None:
+                next_slots[channel] = slot + period
+                continue
+            now = time.monotonic()
+            late_slots = int((now - slot) / period)
+            if late_slots:
+                # the stick would have repeated the last payload in the slots we did not serve
+                channel.missed += late_slots
+                slot += late_slots * period
+            channel.slots += 1
+            channel.slot = slot
+            channel.sent_in_slot = False
+            channel.jitters.append(time.monotonic() - slot)
+            channel.on_broadcast_tx_data(None)
+            if not channel.sent_in_slot:
+                channel.missed += 1
+            channel.slot = None
+            next_slots[channel] = slot + period
+
+    def stop(self):
+        self.running = False
+        self.stopped.set()
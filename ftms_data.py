@@ -0,0 +1,131 @@
+import struct
+
+# FTMS Treadmill Data (0x2ACD)
+# Flags (uint16) decide which fields follow. Bit 0 is inverted: "more data" = 0 means
+# instantaneous speed is present. Fields always appear in the order of this table.
+#   bit, struct format, field names
+TREADMILL_FIELDS = (
+    (0, 'H', ('speed',)),                                       # 0.01 km/h
+    (1, 'H', ('average_speed',)),                               # 0.01 km/h
+    (2, 'HB', ('total_distance', '_total_distance_high')),     # uint24, m
+    (3, 'hh', ('inclination', 'ramp_angle')),                   # 0.1 %, 0.1 deg
+    (4, 'HH', ('elevation_gain_positive', 'elevation_gain_negative')),  # 0.1 m
+    (5, 'B', ('pace',)),                                        # 0.1 km/min
+    (6, 'B', ('average_pace',)),                                # 0.1 km/min
+    (7, 'HHB', ('total_energy', 'energy_per_hour', 'energy_per_minute')),  # kcal
+    (8, 'B', ('heart_rate',)),                                  # bpm
+    (9, 'B', ('metabolic_equivalent',)),                        # 0.1
+    (10, 'H', ('elapsed_time',)),                               # s
+    (11, 'H', ('remaining_time',)),                             # s
+    (12, 'hh', ('force_on_belt', 'power_output')),              # N, W
+)
+
+MORE_DATA = 0x0001
+TOTAL_DISTANCE_PRESENT = 0x0004
+
+_layouts = {}
+_encoders = {}
+_unpack_flags = struct.Struct('<H').unpack_from
+
+
+class TreadmillData:
+    __slots__ = ('flags', 'speed', 'average_speed', 'total_distance', '_total_distance_high',
+                 'inclination', 'ramp_angle', 'elevation_gain_positive', 'elevation_gain_negative',
+                 'pace', 'average_pace', 'total_energy', 'energy_per_hour', 'energy_per_minute',
+                 'heart_rate', 'metabolic_equivalent', 'elapsed_time', 'remaining_time',
+                 'force_on_belt', 'power_output')
+
+    def __init__(self):
+        self.flags = 0
+        self.speed = self.average_speed = 0
+        self.total_distance = self._total_distance_high = 0
+        self.inclination = self.ramp_angle = 0
+        self.elevation_gain_positive = self.elevation_gain_negative = 0
+        self.pace = self.average_pace = 0
+        self.total_energy = self.energy_per_hour = self.energy_per_minute = 0
+        self.heart_rate = self.metabolic_equivalent = 0
+        self.elapsed_time = self.remaining_time = 0
+        self.force_on_belt = self.power_output = 0
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__
+                           if not name.startswith('_'))
+        return f"TreadmillData({fields})"
+
+
+def _fields(flags):
+    fmt = '<'
+    names = ()
+    for bit, field_fmt, field_names in TREADMILL_FIELDS:
+        present = flags & (1 << bit)
+        if bit == 0:
+            present = not present
+        if present:
+            fmt += field_fmt
+            names += field_names
+    return fmt, names
+
+
+def _layout(flags):
+    # (struct, field names) of one flag combination, built once and cached
+    fmt, names = _fields(flags)
+    _layouts[flags] = layout = (struct.Struct(fmt), names)
+    return layout
+
+
+def _encoder(flags):
+    # (struct with the flags in front, field names) of one flag combination, built once and cached
+    fmt, names = _fields(flags)
+    _encoders[flags] = encoder = (struct.Struct('<H' + fmt[1:]), names)
+    return encoder
+
+
+def decode_treadmill_data(data, record=None):
+    """Decode a 0x2ACD notification.
+
+    `data` can be anything supporting the buffer protocol (bytes, bytearray, memoryview); it is
+    unpacked in place and never copied. Pass `record` to reuse an existing TreadmillData: fields
+    missing from this notification keep their last value, so split ("more data") notifications
+    merge into one sample.
+    Raises ValueError if the notification is shorter than its flags announce.
+    """
+    try:
+        flags = _unpack_flags(data)[0]
+        layout, names = _layouts.get(flags) or _layout(flags)
+        values = layout.unpack_from(data, 2)
+    except struct.error:
+        raise ValueError(f"Treadmill data too short: {len(data)} bytes") from None
+    if record is None:
+        record = TreadmillData()
+    index = 0
+    for name in names:  # no zip: one iterator and no pair tuples per notification
+        setattr(record, name, values[index])
+        index += 1
+    if flags & TOTAL_DISTANCE_PRESENT:
+        record.total_distance |= record._total_distance_high << 16
+    record.flags = flags
+    return record
+
+
+def treadmill_flags(data):
+    """Flags of a 0x2ACD notification, None if it is too short to have any.
+
+    The halves of a split sample differ in them ("more data" and the fields present).
+    """
+    return _unpack_flags(data)[0] if len(data) >= 2 else None
+
+
+def encode_treadmill_data(record, flags=None):
+    """Encode a TreadmillData record as a 0x2ACD notification, using its own flags by default."""
+    if flags is None:
+        flags = record.flags
+    layout, names = _encoders.get(flags) or _encoder(flags)
+    values = [flags]
+    for name in names:
+        if name == 'total_distance':
+            values.append(record.total_distance & 0xFFFF)
+        elif name == '_total_distance_high':
+            values.append(record.total_distance >> 16)
+        else:
+            values.append(getattr(record, name))
+    return layout.pack(*values)
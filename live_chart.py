@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+from PySide6 import QtGui, QtWidgets
+from PySide6.QtCore import QPointF, Qt
+
+from data_view import format_time
+
+
+class LiveChart(QtWidgets.QWidget):
+    """Min/max band and mean line of one session series channel, over the session time.
+
+    set_data() takes the (time, low, high, mean) arrays of SessionSeries.window(); there are at most
+    as many buckets as the chart is wide, so painting costs the same however long the session is.
+    NaN values (e.g. the pace of a stopped belt) leave a gap in the line and no band.
+    """
+
+    def __init__(self, title, label="{:.1f}".format, invert=False, parent=None):
+        super(LiveChart, self).__init__(parent)
+        self.title = title
+        self.label = label  # value -> text
+        self.invert = invert  # larger values at the bottom, e.g. pace
+        self.data = None
+        self.setMinimumHeight(90)
+        self.band_brush = QtGui.QBrush(QtGui.QColor(70, 130, 180, 80))
+        self.line_pen = QtGui.QPen(QtGui.QColor(70, 130, 180), 1.5)
+
+    def set_data(self, t, low, high, mean):
+        self.data = (t, low, high, mean)
+        self.update()
+
+    def points(self):
+        # chart width in pixels, the number of buckets worth drawing
+        return max(16, self.width())
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        rect = self.rect().adjusted(4, 18, -4, -16)
+        painter.drawText(4, 14, self.title)
+        if self.data is None or len(self.data[0]) < 2:
+            return
+        t, low, high, mean = self.data
+        runs = _runs(mean)
+        if not runs:
+            return
+        bottom, top = np.nanmin(low), np.nanmax(high)
+        if top - bottom < 1e-6:
+            bottom, top = bottom - 0.5, top + 0.5
+        start, end = t[0], t[-1]
+        x_scale = rect.width() / (end - start) if end > start else 0.0
+        y_scale = rect.height() / (top - bottom)
+        # pixel coordinates, computed on the arrays at once
+        xs = (rect.left() + (t - start) * x_scale).tolist()
+        origin, direction = (rect.top(), y_scale) if self.invert else (rect.bottom(), -y_scale)
+        highs, lows, means = ((origin + (values - bottom) * direction).tolist() for values in (high, low, mean))
+
+        # band: high forward, low backward, split at gaps
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.band_brush)
+        for first, last in runs:
+            upper = [QPointF(xs[i], highs[i]) for i in range(first, last)]
+            lower = [QPointF(xs[i], lows[i]) for i in range(last - 1, first - 1, -1)]
+            painter.drawPolygon(QtGui.QPolygonF(upper + lower))
+        painter.setPen(self.line_pen)
+        painter.setBrush(Qt.NoBrush)
+        for first, last in runs:
+            painter.drawPolyline(QtGui.QPolygonF([QPointF(xs[i], means[i]) for i in range(first, last)]))
+
+        painter.setPen(self.palette().color(QtGui.QPalette.WindowText))
+        latest = mean[-1]
+        if math.isfinite(latest):
+            painter.drawText(rect.right() - 60, 14, self.label(latest))
+        painter.drawText(rect.left(), self.height() - 2, format_time(int(start)))
+        painter.drawText(rect.right() - 60, self.height() - 2, format_time(int(end)))
+        painter.drawText(rect.left() + rect.width() // 2 - 30, 14,
+                         f"{self.label(bottom)} - {self.label(top)}")
+
+
+def _runs(values):
+    # (first, end) index ranges of consecutive non-NaN values
+    valid = np.concatenate(([False], ~np.isnan(values), [False]))
+    edges = np.flatnonzero(valid[1:] != valid[:-1])
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
@@ -0,0 +1,109 @@
+import logging
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+
+class LogModel:
+    """Bounded log between the bus' log topic and the output pane.
+
+    append() never grows memory without bound: at most `max_lines` lines wait for the view (which
+    keeps as many itself), a repeated message only counts up and is reported as "last message
+    repeated N times" when another message arrives, or at most every `repeat_interval` s while it
+    keeps repeating, and more than `burst` lines at `rate` lines/s are suppressed (counted, and
+    still written to the sink); repeats of a suppressed message are suppressed as well. The view
+    collects new lines in batches with take(). `sink` gets every message and keeps the full
+    history, typically a logger with a rotating file (rotating_file_logger).
+    """
+
+    def __init__(self, max_lines=1000, rate=20.0, burst=50, repeat_interval=10.0, sink=None):
+        self.max_lines = max_lines
+        self.pending = deque(maxlen=max_lines)  # lines not taken by the view yet
+        self.rate = rate
+        self.burst = burst
+        self.sink = sink
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.last = None
+        self.repeats = 0
+        self.repeat_interval = repeat_interval
+        self.repeats_shown = 0.0  # when the last message or its repeat count was shown
+        self.suppressed = 0
+        self.flush_requested = False
+
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0  # suppressed by the rate limit
+        self.added = 0  # lines handed to the view
+
+    def append(self, text):
+        # returns True when the view has to schedule a flush
+        self.received += 1
+        if self.sink is not None:
+            self.sink.info(text)
+        if text == self.last:
+            self.repeats += 1
+            self.coalesced += 1
+            if time.monotonic() - self.repeats_shown < self.repeat_interval:
+                return False
+            return self.request_flush()
+        self.flush_repeats()
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+        if self.tokens < 1:
+            self.last = None  # never shown, so its repeats are not "last message repeated"
+            self.suppressed += 1
+            self.dropped += 1
+            return self.request_flush()
+        self.tokens -= 1
+        self.last = text
+        self.repeats_shown = now
+        self.add(text)
+        return self.request_flush()
+
+    def request_flush(self):
+        # True only once until the next take(), so the view schedules one flush per batch
+        if self.flush_requested:
+            return False
+        self.flush_requested = True
+        return True
+
+    def add(self, line):
+        self.pending.append(line)
+        self.added += 1
+
+    def flush_repeats(self):
+        if self.repeats:
+            self.add(f"last message repeated {self.repeats} times")
+            self.repeats = 0
+            self.repeats_shown = time.monotonic()
+
+    def take(self):
+        # lines added since the previous call, oldest first; a count of repeats still going on
+        # waits for the next message or its interval
+        self.flush_requested = False
+        if self.repeats and time.monotonic() - self.repeats_shown >= self.repeat_interval:
+            self.flush_repeats()
+        if self.suppressed:
+            self.add(f"{self.suppressed} messages suppressed" + (", see log file" if self.sink else ""))
+            self.suppressed = 0
+        lines = list(self.pending)
+        self.pending.clear()
+        return lines
+
+    def counters(self):
+        return {"received": self.received, "coalesced": self.coalesced, "dropped": self.dropped,
+                "added": self.added}
+
+
+def rotating_file_logger(path, max_bytes=1 << 20, backups=5, name="bridge.session"):
+    # full log history on disk, `backups` files of at most `max_bytes` besides the current one
+    logger = logging.getLogger(name)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
@@ -0,0 +1,113 @@
+import time
+
+from PySide6.QtBluetooth import QBluetoothAddress, QBluetoothDeviceDiscoveryAgent, QBluetoothUuid
+from PySide6.QtCore import QObject, QTimer, Signal
+
+FTMS_SERVICE = QBluetoothUuid(0x1826)
+
+
+class ParallelDiscovery(QObject):
+    """LE discovery on all local adapters at once, to pick the best radio for the treadmill.
+
+    The first adapter that sees a FTMS (0x1826) device opens a `grace` ms window in which the other
+    adapters can report the same device; then every scan stops. The adapter with the strongest RSSI
+    gets the treadmill role, the best of the rest the peripheral role. finished(treadmill adapter,
+    peripheral adapter, device) reports the addresses, "" where no adapter is left or no treadmill
+    was found within `timeout` ms, and the QBluetoothDeviceInfo of the treadmill as the chosen
+    adapter saw it (None if not found), so BleCentral can connect without scanning again.
+    `results` holds per adapter the RSSI (dBm, None = not seen) and the time to the first sighting
+    in ms.
+    """
+    finished = Signal(str, str, object)
+
+    def __init__(self, adapters, bus, timeout=4000, grace=500, parent=None):
+        super(ParallelDiscovery, self).__init__(parent)
+        self.adapters = list(adapters)  # addresses as strings
+        self.bus = bus
+        self.timeout = timeout
+        self.agents = {}
+        self.results = {adapter: {"rssi": None, "seen_ms": None} for adapter in self.adapters}
+        self.treadmill_address = None  # address of the FTMS device the first adapter saw
+        self.devices = {}  # adapter: newest QBluetoothDeviceInfo of the treadmill it saw
+        self.started = 0.0
+        self.running = False
+
+        self.grace_timer = QTimer(self)
+        self.grace_timer.setSingleShot(True)
+        self.grace_timer.setInterval(grace)
+        self.grace_timer.timeout.connect(self.decide)
+
+    def start(self):
+        self.started = time.monotonic()
+        self.running = True
+        for adapter in self.adapters:
+            agent = QBluetoothDeviceDiscoveryAgent(QBluetoothAddress(adapter), self)
+            agent.setLowEnergyDiscoveryTimeout(self.timeout)
+            agent.deviceDiscovered.connect(lambda device, a=adapter: self.device_seen(a, device))
+            agent.deviceUpdated.connect(lambda device, fields, a=adapter: self.device_seen(a, device))
+            agent.finished.connect(self.agent_finished)
+            agent.errorOccurred.connect(lambda error, a=adapter: self.agent_failed(a, error))
+            self.agents[adapter] = agent
+            agent.start(QBluetoothDeviceDiscoveryAgent.LowEnergyMethod)
+
+    def device_seen(self, adapter, device):
+        if not self.running or FTMS_SERVICE not in device.serviceUuids():
+            return
+        address = device.address().toString()
+        if self.treadmill_address is None:
+            self.treadmill_address = address
+            self.grace_timer.start()
+        elif address != self.treadmill_address:
+            return  # a second treadmill, rank the radios on the first one only
+        self.devices[adapter] = device
+        result = self.results[adapter]
+        if result["seen_ms"] is None:
+            result["seen_ms"] = (time.monotonic() - self.started) * 1000
+        # rssi() is 0 when the adapter did not measure it
+        if device.rssi():
+            result["rssi"] = device.rssi()
+
+    def agent_failed(self, adapter, error):
+        self.bus.publish_log("Discovery", f"Adapter {adapter}: {error}")
+        self.agent_finished()
+
+    def agent_finished(self):
+        if self.running and all(not agent.isActive() for agent in self.agents.values()):
+            self.decide()
+
+    def decide(self):
+        if not self.running:
+            return
+        self.running = False
+        self.grace_timer.stop()
+        for agent in self.agents.values():
+            agent.stop()
+
+        def strength(adapter):
+            # seen with a known RSSI > seen without one > not seen
+            result = self.results[adapter]
+            if result["seen_ms"] is None:
+                return -1000
+            return result["rssi"] if result["rssi"] is not None else -999
+
+        ranked = sorted(self.adapters, key=strength, reverse=True)
+        for adapter in self.adapters:
+            result = self.results[adapter]
+            seen = f"{result['seen_ms']:.0f} ms" if result["seen_ms"] is not None else "not seen"
+            rssi = f"{result['rssi']} dBm" if result["rssi"] is not None else "n/a"
+            self.bus.publish_log("Discovery", f"Adapter {adapter}: FTMS {seen}, RSSI {rssi}")
+        if self.treadmill_address is None:
+            self.bus.publish_log("Discovery", "No FTMS device found on any adapter")
+            self.finished.emit("", "", None)
+            return
+        treadmill = ranked[0]
+        peripheral = ranked[1] if len(ranked) > 1 else ""
+        self.bus.publish_log("Discovery", f"Treadmill {self.treadmill_address} on {treadmill}, "
+                                          f"peripheral on {peripheral or 'none'}")
+        self.finished.emit(treadmill, peripheral, self.devices.get(treadmill))
+
+    def stop(self):
+        self.running = False
+        self.grace_timer.stop()
+        for agent in self.agents.values():
+            agent.stop()
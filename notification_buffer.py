@@ -0,0 +1,96 @@
+from collections import deque
+
+# Policies for a full buffer or a repeated key
+COALESCE = "coalesce"  # a pending value of the same key is replaced by the newer one
+DROP_OLDEST = "drop_oldest"  # a full buffer makes room by dropping its oldest entry
+DROP_NEWEST = "drop_newest"  # a full buffer rejects the new entry
+
+_REPLACED = object()  # key of a queued entry whose value moved on to a newer entry
+
+
+class NotificationBuffer:
+    """Bounded buffer between characteristic notifications and their consumers.
+
+    push() never blocks. Keys with the COALESCE policy hold at most one pending value, all others
+    are queued in arrival order and the buffer's overflow policy decides what to drop when it holds
+    `max_depth` entries. A coalescing key can be split further by `variants`, key -> function of the
+    value: only values of the same variant replace each other (e.g. the halves of a split FTMS
+    notification, told apart by their flags). The replacing value moves to the tail of the queue, so
+    values stay in arrival order: the replaced entry stays in place marked as replaced, in O(1), and
+    is skipped by drain(). A value can carry a `trace` (tracing.Tracer), kept with it and replaced
+    with it; drain() yields [key, value, trace] entries. Counters: received = delivered + coalesced +
+    dropped + pending.
+    """
+
+    def __init__(self, max_depth=32, policies=None, overflow=DROP_OLDEST, variants=None):
+        self.max_depth = max_depth
+        self.policies = policies or {}
+        self.overflow = overflow
+        self.variants = variants or {}
+        self.entries = deque()
+        self.pending = {}  # (key, variant) -> entry of coalescing keys
+        self.live = 0  # queued entries not replaced
+        self.replaced = 0  # queued entries replaced
+
+        self.received = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def push(self, key, value, trace=None):
+        # returns True when the buffer was empty, i.e. the caller has to schedule a drain
+        self.received += 1
+        was_empty = not self.live
+        coalesce = self.policies.get(key) == COALESCE
+        if coalesce:
+            variant = self.variants.get(key)
+            pending_key = (key, variant(value) if variant is not None else None)
+            entry = self.pending.get(pending_key)
+            if entry is not None:
+                entry[0] = _REPLACED
+                entry = [key, value, trace]
+                self.entries.append(entry)
+                self.pending[pending_key] = entry
+                self.coalesced += 1
+                self.replaced += 1
+                if self.replaced > self.max_depth:
+                    self.compact()
+                return False
+        if self.live >= self.max_depth:
+            self.dropped += 1
+            if self.overflow == DROP_NEWEST:
+                return False
+            oldest = self.entries.popleft()
+            while oldest[0] is _REPLACED:
+                self.replaced -= 1
+                oldest = self.entries.popleft()
+            self.live -= 1
+            for oldest_key, entry in self.pending.items():
+                if entry is oldest:
+                    del self.pending[oldest_key]
+                    break
+        entry = [key, value, trace]
+        self.entries.append(entry)
+        self.live += 1
+        if coalesce:
+            self.pending[pending_key] = entry
+        return was_empty
+
+    def compact(self):
+        # drops the replaced entries, so a buffer that is not drained does not grow with them
+        self.entries = deque(entry for entry in self.entries if entry[0] is not _REPLACED)
+        self.replaced = 0
+
+    def drain(self):
+        if self.replaced:
+            self.compact()
+        entries = self.entries
+        self.entries = deque()
+        self.pending.clear()
+        self.delivered += self.live
+        self.live = 0
+        return entries
+
+    def counters(self):
+        return {"received": self.received, "delivered": self.delivered, "coalesced": self.coalesced,
+                "dropped": self.dropped, "pending": self.live}
@@ -7,44 +7,54 @@ from PySide6.QtBluetooth import (QBluetoothUuid, QLowEnergyAdvertisingData,
                                  QLowEnergyController,
                                  QLowEnergyServiceData,
                                  QLowEnergyConnectionParameters)
-from PySide6.QtCore import QByteArray, QTimer, Signal, QThread
+from PySide6.QtCore import QByteArray, QTimer
 
 from qt_ftms import services as ftms_services
+from tracing import BLE_NOTIFY
 
 
-class WriteEmitter(QThread):
-    control_point = Signal(bytearray)
-    peripheral_output = Signal(str)
-    peripheral_co_signal = Signal(bool)
+# Characteristics notified to the connected central
+TREADMILL_DATA = 0x2ACD
+FTMS_STATUS = 0x2ADA
+TRAINING_STATUS = 0x2AD3
+CONTROL_POINT = 0x2AD9
 
-    def __init__(self, parent=None,
-                 runner=False):
-        super(WriteEmitter, self).__init__(parent)
-        self.runner = runner
 
-    def run(self):
-        while self.runner:
-            QThread.msleep(200)
-
-    def emit_data(self, data):
-        self.control_point.emit(data)
+class SharedValues:
+    """Last value of every notify characteristic, as bytes and as the QByteArray written to clients.
 
-    def emit_peripheral_co_signal(self, data):
-        self.peripheral_co_signal.emit(data)
+    Several peripherals can share one instance, so a sample is converted once however many clients
+    it goes to.
+    """
 
-    def emit_peripheral_output(self, data):
-        output = "Peripheral: " + data
-        self.peripheral_output.emit(output)
+    def __init__(self):
+        self.values = {TREADMILL_DATA: (b'\x8C\x05'  # 1000 110000000101 0011 0001 1010 0000
+                                        b'\x00\x00\x00\x00\x00\x00\x00\x00'
+                                        b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'),
+                       FTMS_STATUS: b'\x00',
+                       TRAINING_STATUS: b'\x02\x01'}
+        self.encoded = {uuid: QByteArray(value) for uuid, value in self.values.items()}
+        self.suppressed = 0
 
-    def stop(self):
-        self.runner = False
+    def update(self, uuid, data):
+        # returns False if the value did not change
+        data = bytes(data)
+        if data == self.values[uuid]:
+            self.suppressed += 1
+            return False
+        self.values[uuid] = data
+        self.encoded[uuid] = QByteArray(data)
+        return True
 
 
 class FtmsPeripheral:
-    control_point = Signal(bytearray)
-
-    def __init__(self, local_device=None):
+    def __init__(self, bus, local_device=None, keepalive_interval=2000, recorder=None, tracer=None,
+                 shared=None, link="peripheral"):
         super().__init__()
+        self.bus = bus
+        self.recorder = recorder
+        self.tracer = tracer
+        self.link = link  # name the connection state is published under
         self.advertising_data = QLowEnergyAdvertisingData()
         self.advertising_data.setDiscoverability(
             QLowEnergyAdvertisingData.Discoverability.DiscoverabilityGeneral)  # noqa: E501
@@ -62,16 +72,20 @@ class FtmsPeripheral:
         self.connection_parameters.setLatency(10)
         self.connection_parameters.setSupervisionTimeout(4500)
 
-        self.ftms_value = QByteArray(b'\x8C\x05'  # 1000 110000000101 0011 0001 1010 0000 
-                                     b'\x00\x00\x00\x00\x00\x00\x00\x00'
-                                     b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00')
-        self.ftms_status = QByteArray(b'\x00')
-        self.training_status = QByteArray(b'\x02\x01')
-        self.emitter = WriteEmitter(parent=None, runner=True)
+        # Last value per notify characteristic, possibly shared with other peripherals. Values are
+        # pushed as soon as they change, the keep-alive timer only resends what has not been sent
+        # since its last run. Nothing is written while no central is connected (counted as dropped),
+        # a new connection gets every value.
+        self.shared = shared if shared is not None else SharedValues()
+        self.values = self.shared.values
+        self.sent = set()
+        self.notifications_sent = 0
+        self.notifications_dropped = 0
 
         self.peripheral_connected = False
 
         self.notification_timer = QTimer()
+        self.keepalive_interval = keepalive_interval
 
         self.services = []
         for s_uuid, characters in ftms_services.items():
@@ -88,46 +102,201 @@ class FtmsPeripheral:
             self.service_cb.characteristicChanged.connect(self.write_cb)
             self.services.append(self.service_cb)
 
+        # uuid -> (service, characteristic) of every notify characteristic, looked up once
+        self.notify_chars = {}
+        for service, characters in zip(self.services, ftms_services.values()):
+            for c_uuid, prop in characters.items():
+                if QLowEnergyCharacteristic.PropertyType.Notify in prop[1]:
+                    self.notify_chars[c_uuid] = (service, service.characteristic(QBluetoothUuid(c_uuid)))
+
         self.notification_timer.timeout.connect(self.notification_provider)
-        self.notification_timer.start(500)
+        self.notification_timer.start(self.keepalive_interval)
 
     def run(self):
         self.le_controller.startAdvertising(QLowEnergyAdvertisingParameters(),
                                             self.advertising_data, self.advertising_data)
-        self.emitter.start()
 
     def connected(self, data):
         print("State changed", data)
         if data == QLowEnergyController.ControllerState.ConnectedState:
             self.peripheral_connected = True
-            self.emitter.emit_peripheral_output("Connected.")
+            self.bus.publish_log("Peripheral", "Connected.")
+            self.bus.publish_connection_state(self.link, True)
+            for uuid in self.notify_chars:
+                self.notify(uuid)
         elif data == QLowEnergyController.ControllerState.UnconnectedState:
             self.peripheral_connected = False
-            self.emitter.emit_peripheral_co_signal(False)
+            self.bus.publish_connection_state(self.link, False)
 
     def reconnect(self):
         # service = le_controller.addService(service_data)
-        self.emitter.emit_peripheral_output("Connection lost.")
+        self.bus.publish_log("Peripheral", "Connection lost.")
         self.peripheral_connected = False
-        self.emitter.emit_peripheral_co_signal(False)
+        self.bus.publish_connection_state(self.link, False)
+
+    @property
+    def ftms_value(self):
+        return self.values[TREADMILL_DATA]
+
+    @ftms_value.setter
+    def ftms_value(self, data):
+        self.update_value(TREADMILL_DATA, data)
+
+    @property
+    def ftms_status(self):
+        return self.values[FTMS_STATUS]
+
+    @ftms_status.setter
+    def ftms_status(self, data):
+        self.update_value(FTMS_STATUS, data)
+
+    @property
+    def training_status(self):
+        return self.values[TRAINING_STATUS]
+
+    @training_status.setter
+    def training_status(self, data):
+        self.update_value(TRAINING_STATUS, data)
+
+    def update_value(self, uuid, data):
+        if self.shared.update(uuid, data):
+            self.notify(uuid, fresh=True)
+
+    def notify(self, uuid, fresh=False):
+        # fresh: a new value, set right after its sample arrived; keep-alive resends are not traced
+        if not self.peripheral_connected:
+            self.notifications_dropped += 1
+            return
+        service, characteristic = self.notify_chars[uuid]
+        service.writeCharacteristic(characteristic, self.shared.encoded[uuid])
+        self.sent.add(uuid)
+        self.notifications_sent += 1
+        if fresh and uuid == TREADMILL_DATA and self.tracer is not None:
+            self.tracer.stamp(BLE_NOTIFY)
 
     def notification_provider(self):
-        for service in self.services:
-            for characteristic in service.characteristics():
-                if QLowEnergyCharacteristic.PropertyType.Notify in characteristic.properties():
-                    if characteristic.uuid() == QBluetoothUuid(0x2ACD):     # treadmill data
-                        service.writeCharacteristic(characteristic, self.ftms_value)
-                    elif characteristic.uuid() == QBluetoothUuid(0x2ADA):   # ftms status
-                        service.writeCharacteristic(characteristic, self.ftms_status)
-                    elif characteristic.uuid() == QBluetoothUuid(0x2AD3):   # training status
-                        service.writeCharacteristic(characteristic, self.training_status)
-                    else:
-                        pass
+        # keep-alive: resend values that did not change since the last run
+        for uuid in self.notify_chars:
+            if uuid not in self.sent:
+                self.notify(uuid)
+        self.sent.clear()
 
     def write_cb(self, char, value):
-        self.emitter.emit_data(value)
+        data = value.data()
+        if self.recorder is not None:
+            self.recorder.record(CONTROL_POINT, data)
+        self.bus.publish_control_point(data)
 
     def stop(self):
-        self.emitter.stop()
+        self.notification_timer.stop()
         self.le_controller.stopAdvertising()
         self.le_controller.disconnectFromDevice()
+
+
+class PeripheralFanout:
+    """One FtmsPeripheral per adapter, so several centrals (training app, tablet, ...) can attach.
+
+    A Qt peripheral controller serves one central, so the fan-out runs one per adapter, all fed from
+    the same SharedValues: a sample is converted once and written to every connected client. Has
+    the interface of FtmsPeripheral. A client disconnecting only rebuilds its own peripheral after
+    `rebuild_delay` ms. The supervised "peripheral" link is published connected once the fan-out
+    runs and stays so while clients come and go, which are only logged: a supervisor taking the
+    link down would restart every adapter's peripheral.
+    """
+
+    def __init__(self, adapters, bus, rebuild_delay=1000, **kwargs):
+        self.bus = bus
+        self.adapters = {adapter.toString(): adapter for adapter in adapters}  # QBluetoothAddress
+        self.rebuild_delay = rebuild_delay
+        self.kwargs = kwargs
+        self.shared = SharedValues()
+        self.peripherals = {}  # adapter: FtmsPeripheral
+        self.totals = {adapter: [0, 0] for adapter in self.adapters}  # sent, dropped of rebuilt instances
+        self.clients = set()
+        self.running = False
+        self.bus.connection_state.connect(self.connection_state)
+
+    def create(self, adapter):
+        peripheral = FtmsPeripheral(local_device=self.adapters[adapter], bus=self.bus, shared=self.shared,
+                                    link="peripheral " + adapter, **self.kwargs)
+        self.peripherals[adapter] = peripheral
+        peripheral.run()
+
+    def run(self):
+        self.running = True
+        for adapter in self.adapters:
+            self.create(adapter)
+        self.bus.publish_connection_state("peripheral", True)
+
+    def rebuild(self, adapter):
+        if self.running and adapter not in self.peripherals:
+            self.create(adapter)
+
+    def connection_state(self, link, connected):
+        adapter = link[len("peripheral "):]
+        if not link.startswith("peripheral ") or adapter not in self.peripherals:
+            return
+        if connected:
+            self.clients.add(adapter)
+            self.bus.publish_log("Peripheral", f"{len(self.clients)} clients connected")
+            return
+        if adapter in self.clients:
+            self.clients.discard(adapter)
+            self.bus.publish_log("Peripheral", f"{len(self.clients)} clients connected")
+        peripheral = self.peripherals.pop(adapter)
+        self.totals[adapter][0] += peripheral.notifications_sent
+        self.totals[adapter][1] += peripheral.notifications_dropped
+        peripheral.stop()
+        QTimer.singleShot(self.rebuild_delay, lambda: self.rebuild(adapter))
+
+    def update_value(self, uuid, data):
+        if self.shared.update(uuid, data):
+            for peripheral in self.peripherals.values():
+                peripheral.notify(uuid, fresh=True)
+
+    @property
+    def ftms_value(self):
+        return self.shared.values[TREADMILL_DATA]
+
+    @ftms_value.setter
+    def ftms_value(self, data):
+        self.update_value(TREADMILL_DATA, data)
+
+    @property
+    def ftms_status(self):
+        return self.shared.values[FTMS_STATUS]
+
+    @ftms_status.setter
+    def ftms_status(self, data):
+        self.update_value(FTMS_STATUS, data)
+
+    @property
+    def training_status(self):
+        return self.shared.values[TRAINING_STATUS]
+
+    @training_status.setter
+    def training_status(self, data):
+        self.update_value(TRAINING_STATUS, data)
+
+    def counters(self):
+        # per adapter: notifications written to its client, and dropped while it had none
+        counters = {}
+        for adapter, (sent, dropped) in self.totals.items():
+            peripheral = self.peripherals.get(adapter)
+            if peripheral is not None:
+                sent += peripheral.notifications_sent
+                dropped += peripheral.notifications_dropped
+            counters[adapter] = {"sent": sent, "dropped": dropped, "connected": adapter in self.clients}
+        return counters
+
+    def stop(self):
+        self.running = False
+        self.bus.connection_state.disconnect(self.connection_state)
+        for adapter, counters in self.counters().items():
+            self.bus.publish_log("Peripheral", f"{adapter}: {counters['sent']} notifications sent, "
+                                               f"{counters['dropped']} dropped")
+        self.bus.publish_log("Peripheral", f"{self.shared.suppressed} unchanged values suppressed")
+        for peripheral in self.peripherals.values():
+            peripheral.stop()
+        self.peripherals.clear()
+        self.clients.clear()
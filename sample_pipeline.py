@@ -0,0 +1,212 @@
+import time
+
+from ftms_data import MORE_DATA, TOTAL_DISTANCE_PRESENT, TreadmillData
+
+# Supported speed range the bridge advertises (0x2AD4 in qt_ftms): 1.00 - 16.00 km/h, 0.1 steps
+SPEED_MIN = 100  # 0.01 km/h
+SPEED_MAX = 1600
+
+
+def _copy(source, target, fields=TreadmillData.__slots__):
+    for name in fields:
+        setattr(target, name, getattr(source, name))
+
+
+class Calibration:
+    """Scales speed and distance by the belt's calibration factors (measured / displayed)."""
+    name = "calibration"
+
+    def __init__(self, speed_factor=1.0, distance_factor=1.0):
+        self.speed_factor = speed_factor
+        self.distance_factor = distance_factor
+
+    def process(self, sample, speed, distance):
+        if speed:
+            sample.speed = int(sample.speed * self.speed_factor + 0.5)
+        if distance:
+            sample.total_distance = int(sample.total_distance * self.distance_factor)
+
+
+class SpeedClamp:
+    """Keeps a running belt's speed inside the advertised range, 0 (stopped) passes."""
+    name = "clamp"
+
+    def __init__(self, minimum=SPEED_MIN, maximum=SPEED_MAX):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.clamped = 0
+
+    def process(self, sample, speed, distance):
+        if not speed:
+            return
+        speed = sample.speed
+        if speed and not self.minimum <= speed <= self.maximum:
+            sample.speed = self.minimum if speed < self.minimum else self.maximum
+            self.clamped += 1
+
+
+class SpikeFilter:
+    """Holds the last value when speed or distance jumps further than a belt can in one sample.
+
+    A jump of more than `max_step` (0.01 km/h) or `max_distance_step` (m, forward) is taken only
+    once `confirm` samples in a row are off the held value and within that step of each other, so
+    two different spikes in a row do not confirm one another; a stop (speed 0), a start after a
+    stop and a distance going backwards (reset) pass at once.
+    """
+    name = "spikes"
+
+    def __init__(self, max_step=300, max_distance_step=50, confirm=2):
+        self.max_step = max_step
+        self.max_distance_step = max_distance_step
+        self.confirm = confirm
+        self.speed = None
+        self.distance = None
+        self.speed_suspect = 0  # samples in a row off the held speed and agreeing with each other
+        self.speed_candidate = 0  # the last of them
+        self.distance_suspect = 0
+        self.distance_candidate = 0
+        self.rejected = 0
+
+    def process(self, sample, speed, distance):
+        if speed:
+            speed = sample.speed
+            if not self.speed or not speed or abs(speed - self.speed) <= self.max_step:
+                self.speed = speed
+                self.speed_suspect = 0
+            else:
+                if self.speed_suspect and abs(speed - self.speed_candidate) <= self.max_step:
+                    self.speed_suspect += 1
+                else:
+                    self.speed_suspect = 1
+                self.speed_candidate = speed
+                if self.speed_suspect >= self.confirm:
+                    self.speed = speed
+                    self.speed_suspect = 0
+                else:
+                    sample.speed = self.speed
+                    self.rejected += 1
+        if distance:
+            distance = sample.total_distance
+            if self.distance is None or distance - self.distance <= self.max_distance_step:
+                self.distance = distance
+                self.distance_suspect = 0
+            else:
+                step = distance - self.distance_candidate
+                if self.distance_suspect and 0 <= step <= self.max_distance_step:
+                    self.distance_suspect += 1
+                else:
+                    self.distance_suspect = 1
+                self.distance_candidate = distance
+                if self.distance_suspect >= self.confirm:
+                    self.distance = distance
+                    self.distance_suspect = 0
+                else:
+                    sample.total_distance = self.distance
+                    self.rejected += 1
+
+
+class SpeedSmoothing:
+    """Moving average of the speed over the last `window` samples, on a preallocated ring.
+
+    A stop passes at once and empties the window.
+    """
+    name = "smoothing"
+
+    def __init__(self, window=3):
+        self.window = window
+        self.ring = [0] * window
+        self.index = 0
+        self.count = 0
+        self.total = 0
+
+    def process(self, sample, speed, distance):
+        if not speed:
+            return
+        speed = sample.speed
+        ring = self.ring
+        if not speed:
+            if self.count:
+                for index in range(self.window):
+                    ring[index] = 0
+                self.index = self.count = self.total = 0
+            return
+        self.total += speed - ring[self.index]
+        ring[self.index] = speed
+        self.index = (self.index + 1) % self.window
+        if self.count < self.window:
+            self.count += 1
+        sample.speed = (self.total + self.count // 2) // self.count
+
+
+class SamplePipeline:
+    """Corrects every treadmill sample once, for the ANT+ feed, the BLE peripheral and the display.
+
+    process() copies the decoded notification into the pipeline's own preallocated record (the raw
+    one keeps merging split notifications and stays what the control buttons work from) and runs
+    the stages on it in place; no stage allocates containers or records per sample. A stage's
+    process(sample, speed, distance) only corrects the speed and distance when this notification
+    carries them: a split treadmill sends the speed in one notification and the distance in the
+    other, the fields merged from the other keep their corrected value of the previous call, so a
+    sample passes every stage once. The time spent in every stage is summed, costs() gives the mean
+    per notification.
+    """
+
+    def __init__(self, stages=()):
+        self.stages = list(stages)
+        self.sample = TreadmillData()
+        self.names = ["copy"] + [stage.name for stage in self.stages]
+        self.times = [0] * len(self.names)  # ns per stage
+        self.notifications = 0
+
+    def process(self, record):
+        sample = self.sample
+        times = self.times
+        clock = time.perf_counter_ns
+        start = clock()
+        speed, distance = sample.speed, sample.total_distance  # corrected, of the previous call
+        _copy(record, sample)
+        flags = sample.flags
+        has_speed = not flags & MORE_DATA
+        has_distance = flags & TOTAL_DISTANCE_PRESENT
+        if not has_speed:
+            sample.speed = speed
+        if not has_distance:
+            sample.total_distance = distance
+        now = clock()
+        times[0] += now - start
+        index = 1
+        for stage in self.stages:
+            stage.process(sample, has_speed, has_distance)
+            start, now = now, clock()
+            times[index] += now - start
+            index += 1
+        self.notifications += 1
+        return sample
+
+    def costs(self):
+        # mean ns per notification and stage
+        count = self.notifications
+        return {name: total / count if count else 0.0 for name, total in zip(self.names, self.times)}
+
+    def report(self):
+        counters = []
+        for stage in self.stages:
+            for counter in ("clamped", "rejected"):
+                if hasattr(stage, counter):
+                    counters.append(f"{stage.name} {counter} {getattr(stage, counter)}")
+        costs = ", ".join(f"{name} {cost:.0f} ns" for name, cost in self.costs().items())
+        return (f"{self.notifications} notifications, " + costs
+                + ("; " + ", ".join(counters) if counters else ""))
+
+
+def build_pipeline(speed_factor=1.0, distance_factor=1.0, spike_limit=3.0, smoothing=0):
+    # the stages that have something to do: spike_limit in km/h per sample (0 = off), smoothing in samples
+    stages = []
+    if speed_factor != 1.0 or distance_factor != 1.0:
+        stages.append(Calibration(speed_factor, distance_factor))
+    if spike_limit:
+        stages.append(SpikeFilter(max_step=int(spike_limit * 100)))
+    if smoothing > 1:
+        stages.append(SpeedSmoothing(smoothing))
+    stages.append(SpeedClamp())
+    return SamplePipeline(stages)
@@ -0,0 +1,99 @@
+import mmap
+import os
+import struct
+import time
+
+# Session log: append-only binary file
+#   header: MAGIC
+#   record: uint64 time in ns since the start of the recording (monotonic clock),
+#           uint16 characteristic uuid, uint8 payload length, payload
+MAGIC = b"FTMSLOG1"
+RECORD = struct.Struct('<QHB')
+
+TREADMILL_DATA = 0x2ACD
+FTMS_STATUS = 0x2ADA
+TRAINING_STATUS = 0x2AD3
+CONTROL_POINT = 0x2AD9
+
+
+class SessionRecorder:
+    """Appends raw notifications and control point writes to a session log.
+
+    Appending to an existing log continues its clock, so one file can hold several sessions. A record
+    cut short by a crash at the end of the log is truncated away first, so the new records stay
+    aligned.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        offset = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            reader = SessionReader(path)
+            end_time, end_offset = reader.end()
+            reader.close()
+            offset = end_time + 1
+            if end_offset < os.path.getsize(path):
+                with open(path, 'r+b') as file:
+                    file.truncate(end_offset)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.start = time.monotonic_ns() - offset
+        self.last_flush = time.monotonic()
+        self.records = 0
+
+    def record(self, uuid, data):
+        self.file.write(RECORD.pack(time.monotonic_ns() - self.start, uuid, len(data)))
+        self.file.write(data)
+        self.records += 1
+        now = time.monotonic()
+        if now - self.last_flush > self.flush_interval:
+            self.file.flush()
+            self.last_flush = now
+
+    def close(self):
+        self.file.close()
+
+
+class SessionReader:
+    """Memory-mapped reader; iterating yields (time ns, uuid, payload memoryview) per record.
+
+    The payload views point into the map: close the iterator and drop the views before close(),
+    the map cannot be closed while a view of it is alive (BufferError).
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not a session log")
+
+    def __iter__(self):
+        view = memoryview(self.map)
+        position = len(MAGIC)
+        end = len(view) - RECORD.size
+        while position <= end:
+            t_ns, uuid, length = RECORD.unpack_from(view, position)
+            position += RECORD.size
+            if position + length > len(view):
+                break  # truncated last record
+            yield t_ns, uuid, view[position:position + length]
+            position += length
+
+    def end(self):
+        # (time of the last complete record, -1 without any, offset right after it)
+        t_ns = -1
+        position = len(MAGIC)
+        size = len(self.map)
+        while position + RECORD.size <= size:
+            record_ns, _, length = RECORD.unpack_from(self.map, position)
+            if position + RECORD.size + length > size:
+                break  # truncated last record
+            t_ns = record_ns
+            position += RECORD.size + length
+        return t_ns, position
+
+    def close(self):
+        self.map.close()
@@ -0,0 +1,79 @@
+import time
+
+from PySide6.QtCore import QObject, QTimer, Qt, Signal
+
+from session_log import SessionReader, TREADMILL_DATA, FTMS_STATUS, TRAINING_STATUS, CONTROL_POINT
+
+
+class SessionReplay(QObject):
+    """Feeds a session log back into the event bus.
+
+    `speed` 1 replays in real time, N replays N times faster, 0 as fast as possible (in batches, so
+    the event loop keeps running). Control point writes are only replayed on request, the recorded
+    treadmill has already answered them. The log is closed when the replay finishes or is stopped.
+    """
+    finished = Signal()
+
+    def __init__(self, path, bus, speed=1.0, include_control_point=False, batch=200, tracer=None, parent=None):
+        super(SessionReplay, self).__init__(parent)
+        self.reader = SessionReader(path)
+        self.bus = bus
+        self.tracer = tracer
+        self.speed = speed
+        self.batch = batch
+        self.publishers = {TREADMILL_DATA: bus.publish_treadmill_data,
+                           FTMS_STATUS: bus.publish_status,
+                           TRAINING_STATUS: bus.publish_training_status}
+        if include_control_point:
+            self.publishers[CONTROL_POINT] = bus.publish_control_point
+        self.records = iter(self.reader)
+        self.next_record = None
+        self.start = None
+        self.replayed = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.replay)
+
+    def start_replay(self):
+        self.start = time.monotonic_ns()
+        self.next_record = next(self.records, None)
+        self.replay()
+
+    def replay(self):
+        count = 0
+        while self.next_record is not None:
+            t_ns, uuid, data = self.next_record
+            if self.speed > 0:
+                due = (t_ns / self.speed - (time.monotonic_ns() - self.start)) / 1e6
+                if due > 0:
+                    self.timer.start(int(due))
+                    return
+            elif count >= self.batch:
+                self.timer.start(0)
+                return
+            publish = self.publishers.get(uuid)
+            if publish is not None:
+                if uuid == TREADMILL_DATA and self.tracer is not None:
+                    publish(bytes(data), self.tracer.arrived())
+                else:
+                    publish(bytes(data))
+                self.replayed += 1
+            count += 1
+            self.next_record = next(self.records, None)
+        data = None  # the last view into the map, close() needs it gone
+        self.close()
+        self.finished.emit()
+
+    def stop(self):
+        self.timer.stop()
+        self.close()
+
+    def close(self):
+        if self.reader is None:
+            return
+        self.next_record = None
+        self.records.close()  # releases the iterator's view of the map
+        self.reader.close()
+        self.reader = None
@@ -0,0 +1,145 @@
+import struct
+import time
+
+from PySide6.QtCore import QTimer, Qt
+
+from control_point import ControlPointQueue
+from ftms_data import encode_treadmill_data, TreadmillData
+from treadmill_backend import TreadmillBackend
+
+# Treadmill data layout of the simulated treadmill: speed, distance, incline, energy, heart rate,
+# elapsed time. The same flags the bridge advertises as peripheral.
+TREADMILL_FLAGS = 0x058C
+
+# FTMS status (0x2ADA) op codes
+STATUS_RESET = 0x01
+STATUS_STOPPED_OR_PAUSED = 0x02
+STATUS_STARTED = 0x04
+STATUS_TARGET_SPEED = 0x05
+STATUS_TARGET_INCLINE = 0x06
+
+# Training status (0x2AD3)
+TRAINING_IDLE = 0x01
+TRAINING_MANUAL = 0x0D
+
+RUNNER_WEIGHT = 75  # kg, about 1 kcal per kg and km on the flat
+
+
+class SimulatedTreadmill(TreadmillBackend):
+    """A FTMS treadmill without Bluetooth.
+
+    Speed and incline ramp towards their targets at `speed_ramp` (km/h per s) and `incline_ramp`
+    (% per s), distance, energy and elapsed time accumulate while the belt runs. Treadmill data is
+    published `data_rate` times per second, which can be raised far beyond a real treadmill for load
+    testing. Answers control point op codes 0x00, 0x01, 0x02, 0x03, 0x07 and 0x08 with the status
+    notifications a treadmill would send.
+    """
+
+    def __init__(self, bus, data_rate=1.0, speed_ramp=1.0, incline_ramp=1.0, tracer=None):
+        super(SimulatedTreadmill, self).__init__(bus, tracer)
+        self.data_rate = data_rate
+        self.speed_ramp = speed_ramp * 100  # 0.01 km/h per s
+        self.incline_ramp = incline_ramp * 10  # 0.1 % per s
+
+        self.data = TreadmillData()
+        self.data.flags = TREADMILL_FLAGS
+        self.speed = 0.0  # 0.01 km/h
+        self.target_speed = 0
+        self.incline = 0.0  # 0.1 %
+        self.target_incline = 0
+        self.distance = 0.0  # m
+        self.energy = 0.0  # kcal
+        self.elapsed = 0.0  # s
+        self.running = False
+        self.connected = False
+        self.last_tick = None
+        self.published = 0
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.commands = ControlPointQueue(self.control_point, pace=0)
+
+    def run(self):
+        self.connected = True
+        self.last_tick = time.monotonic()
+        self.timer.start(max(1, int(1000 / self.data_rate)))
+        self.bus.publish_log("Central", "Connected to simulated treadmill")
+        self.bus.publish_connection_state("central", True)
+        self.bus.publish_training_status(bytes([0x00, TRAINING_IDLE]))
+
+    def update_ftms(self, value, pace=None):
+        return self.commands.put(value, pace)
+
+    def control_point(self, value):
+        if not value:
+            return False
+        opcode = value[0]
+        if opcode == 0x00:  # request control
+            pass
+        elif opcode == 0x01:  # reset
+            self.running = False
+            self.speed = self.incline = 0.0
+            self.target_speed = self.target_incline = 0
+            self.distance = self.energy = self.elapsed = 0.0
+            self.bus.publish_status(bytes([STATUS_RESET]))
+            self.bus.publish_training_status(bytes([0x00, TRAINING_IDLE]))
+        elif opcode == 0x02 and len(value) >= 3:  # target speed, 0.01 km/h
+            self.target_speed = struct.unpack_from('<H', value, 1)[0]
+            self.bus.publish_status(bytes([STATUS_TARGET_SPEED]) + bytes(value[1:3]))
+        elif opcode == 0x03 and len(value) >= 3:  # target inclination, 0.1 %
+            self.target_incline = struct.unpack_from('<h', value, 1)[0]
+            self.bus.publish_status(bytes([STATUS_TARGET_INCLINE]) + bytes(value[1:3]))
+        elif opcode == 0x07:  # start or resume
+            self.running = True
+            self.bus.publish_status(bytes([STATUS_STARTED]))
+            self.bus.publish_training_status(bytes([0x00, TRAINING_MANUAL]))
+        elif opcode == 0x08 and len(value) >= 2:  # stop (1) or pause (2)
+            self.running = False
+            self.target_speed = 0
+            self.speed = 0.0
+            self.bus.publish_status(bytes([STATUS_STOPPED_OR_PAUSED, value[1]]))
+            self.bus.publish_training_status(bytes([0x00, TRAINING_IDLE]))
+        else:
+            self.bus.publish_log("Central", f"Simulated treadmill: op code 0x{opcode:02X} not supported")
+            return False
+        return True
+
+    def tick(self):
+        now = time.monotonic()
+        dt = now - self.last_tick
+        self.last_tick = now
+
+        if self.running:
+            self.speed = self.ramp(self.speed, self.target_speed, self.speed_ramp * dt)
+            self.incline = self.ramp(self.incline, self.target_incline, self.incline_ramp * dt)
+            meters = self.speed / 360 * dt
+            self.distance += meters
+            self.energy += RUNNER_WEIGHT * meters / 1000 * (1 + max(self.incline, 0) / 100)
+            self.elapsed += dt
+
+        data = self.data
+        data.speed = int(self.speed)
+        data.total_distance = int(self.distance) & 0xFFFFFF
+        data.inclination = int(self.incline)
+        data.total_energy = int(self.energy) & 0xFFFF
+        data.energy_per_hour = int(RUNNER_WEIGHT * self.speed / 100) if self.running else 0
+        data.energy_per_minute = data.energy_per_hour // 60
+        data.elapsed_time = int(self.elapsed) & 0xFFFF
+        trace = self.tracer.arrived() if self.tracer is not None else None
+        self.bus.publish_treadmill_data(encode_treadmill_data(data), trace)
+        self.published += 1
+
+    @staticmethod
+    def ramp(value, target, step):
+        if value < target:
+            return min(value + step, target)
+        return max(value - step, target)
+
+    def stop(self):
+        self.timer.stop()
+        self.commands.clear()
+        if self.connected:
+            self.connected = False
+            self.bus.publish_log("Central", f"Simulated treadmill stopped after {self.published} notifications")
+            self.bus.publish_connection_state("central", False)
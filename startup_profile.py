@@ -0,0 +1,88 @@
+import builtins
+import os
+import sys
+import time
+
+
+def process_age():
+    # seconds since the process was started (Linux, 10 ms resolution), None elsewhere
+    try:
+        with open("/proc/self/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime:
+            now = float(uptime.read().split()[0])
+        return now - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def resident_memory():
+    # current resident set size in MB, peak RSS where /proc is not available, 0 if neither is
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def startup_report(name):
+    age = process_age()
+    started = f"{age * 1000:.0f} ms" if age is not None else "n/a"
+    return f"Startup {name}: {started} since process start, RSS {resident_memory():.1f} MB"
+
+
+class ImportProfiler:
+    """Measures the cost of every module imported while installed (--profile-startup).
+
+    Wraps builtins.__import__; a module is timed the first time it is imported, `self` excludes the
+    modules it imported in turn. The import stack is not thread-safe, uninstall() once startup is
+    measured and before other threads import.
+    """
+
+    def __init__(self):
+        self.times = {}  # module: [inclusive s, self s]
+        self.stack = []
+        self.original_import = None
+
+    @classmethod
+    def from_argv(cls, argv, flag="--profile-startup"):
+        if flag not in argv:
+            return None
+        profiler = cls()
+        profiler.install()
+        return profiler
+
+    def install(self):
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.profiled_import
+
+    def uninstall(self):
+        if builtins.__import__ == self.profiled_import:
+            builtins.__import__ = self.original_import
+
+    def profiled_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        self.stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            inclusive = time.perf_counter() - start
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += inclusive
+            self.times[name] = [inclusive, inclusive - children]
+
+    def report(self, top=15):
+        total = sum(own for _, own in self.times.values())
+        lines = [f"Imports: {len(self.times)} modules, {total * 1000:.0f} ms (inclusive / self ms)"]
+        ranked = sorted(self.times.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (inclusive, own) in ranked[:top]:
+            lines.append(f"  {name:40s} {inclusive * 1000:8.1f} {own * 1000:8.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,174 @@
+import random
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+# Link states
+STOPPED = "stopped"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+BACKOFF = "backoff"  # down, waiting for the retry timer
+FAILED = "failed"  # gave up after max_retries consecutive failures
+
+
+class LinkSupervisor(QObject):
+    """Lifecycle of one link (central, peripheral or ant) as a state machine.
+
+        STOPPED --start()--> CONNECTING --up--> CONNECTED
+        CONNECTING/CONNECTED --down--> BACKOFF --timer--> CONNECTING
+        CONNECTING --down, max_retries failures in a row--> FAILED
+
+    `start_link` (re)creates and starts the link, `stop_link` tears it down; both are called from
+    the event loop and must not block. Retries wait initial_delay * factor ** n ms, capped at
+    max_delay, +- `jitter` of it, on a single-shot timer. The link reports up and down through
+    link_up() / link_down(), usually via the bus' connection_state.
+    """
+    state_changed = Signal(str, str)  # link, state
+
+    def __init__(self, name, start_link, stop_link, bus=None, initial_delay=1000, max_delay=30000, factor=2.0,
+                 jitter=0.2, max_retries=None, parent=None):
+        super(LinkSupervisor, self).__init__(parent)
+        self.name = name
+        self.start_link = start_link
+        self.stop_link = stop_link
+        self.bus = bus
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.max_retries = max_retries
+
+        self.state = STOPPED
+        self.failures = 0  # consecutive failed attempts
+        self.delay = 0  # ms of the pending retry
+
+        self.connected_since = None
+        self.uptime = 0.0  # s, closed connections
+        self.down_since = None  # when an established connection dropped
+        self.reconnects = 0
+        self.recover_times = []  # ms from drop to connected again
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.retry)
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.state_changed.emit(self.name, state)
+
+    def start(self):
+        if self.state not in (STOPPED, FAILED):
+            return
+        self.failures = 0
+        self.set_state(CONNECTING)
+        self.start_link()
+
+    def stop(self):
+        if self.state == STOPPED:
+            return
+        self.timer.stop()
+        self.close_uptime()
+        self.down_since = None
+        previous = self.state
+        self.set_state(STOPPED)
+        if previous not in (FAILED, BACKOFF):
+            self.stop_link()
+
+    def link_up(self):
+        if self.state not in (CONNECTING, BACKOFF):
+            return
+        self.timer.stop()
+        now = time.monotonic()
+        if self.down_since is not None:
+            self.recover_times.append((now - self.down_since) * 1000)
+            self.down_since = None
+        self.connected_since = now
+        self.failures = 0
+        self.set_state(CONNECTED)
+
+    def link_down(self):
+        if self.state == CONNECTED:
+            self.close_uptime()
+            self.down_since = time.monotonic()
+            self.reconnects += 1
+        elif self.state == CONNECTING:
+            self.failures += 1
+        else:
+            return  # stopped, failed or already waiting
+        # the state changes first: stopping a link can report it down once more
+        if self.max_retries is not None and self.failures >= self.max_retries:
+            self.down_since = None
+            self.publish_log(f"giving up after {self.failures} attempts")
+            self.set_state(FAILED)
+            self.stop_link()
+            return
+        delay = min(self.max_delay, self.initial_delay * self.factor ** self.failures)
+        self.delay = int(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+        self.publish_log(f"down, retry in {self.delay} ms")
+        self.set_state(BACKOFF)
+        self.stop_link()
+        self.timer.start(self.delay)
+
+    def retry(self):
+        if self.state != BACKOFF:
+            return
+        self.set_state(CONNECTING)
+        self.start_link()
+
+    def close_uptime(self):
+        if self.connected_since is not None:
+            self.uptime += time.monotonic() - self.connected_since
+            self.connected_since = None
+
+    def publish_log(self, text):
+        if self.bus is not None:
+            self.bus.publish_log("Supervisor", f"{self.name} {text}")
+
+    def metrics(self):
+        uptime = self.uptime
+        if self.connected_since is not None:
+            uptime += time.monotonic() - self.connected_since
+        recover = self.recover_times
+        return {"state": self.state, "uptime_s": uptime, "reconnects": self.reconnects,
+                "recover_mean_ms": sum(recover) / len(recover) if recover else 0.0,
+                "recover_max_ms": max(recover) if recover else 0.0}
+
+
+class ConnectionSupervisor(QObject):
+    """Owns the LinkSupervisors of a bridge and feeds them the bus' connection_state."""
+    state_changed = Signal(str, str)  # link, state
+
+    def __init__(self, bus, parent=None):
+        super(ConnectionSupervisor, self).__init__(parent)
+        self.bus = bus
+        self.links = {}
+        bus.connection_state.connect(self.connection_state)
+
+    def add(self, name, start_link, stop_link, **backoff):
+        link = LinkSupervisor(name, start_link, stop_link, bus=self.bus, parent=self, **backoff)
+        link.state_changed.connect(self.state_changed)
+        self.links[name] = link
+        return link
+
+    def connection_state(self, name, connected):
+        link = self.links.get(name)
+        if link is None:
+            return
+        if connected:
+            link.link_up()
+        else:
+            link.link_down()
+
+    def stop(self):
+        for link in self.links.values():
+            link.stop()
+
+    def report(self):
+        lines = []
+        for name, link in self.links.items():
+            metrics = link.metrics()
+            lines.append(f"{name}: {metrics['state']}, up {metrics['uptime_s']:.0f} s, "
+                         f"{metrics['reconnects']} reconnects, recover mean {metrics['recover_mean_ms']:.0f} ms, "
+                         f"max {metrics['recover_max_ms']:.0f} ms")
+        return "\n".join(lines)
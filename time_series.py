@@ -0,0 +1,137 @@
+try:
+    import numpy as np
+except ImportError:  # live charts are optional
+    np = None
+
+# Channels of a session series
+SPEED = 0  # km/h
+INCLINE = 1  # %
+CHANNELS = ("speed", "incline")
+
+PACE_MAX = 20.0  # min/km, slower paces (walking, stopping within a bucket) are drawn at this
+
+
+def pace(low, high, mean):
+    """(low, high, mean) pace in min/km of speed buckets in km/h; NaN where the belt stood."""
+    moving = mean > 0
+    floor = 60 / PACE_MAX  # km/h
+    return tuple(np.where(moving, 60 / np.maximum(speed, floor), np.nan) for speed in (high, low, mean))
+
+
+class SessionSeries:
+    """Fixed-memory time series of a session at several resolutions, for live charts.
+
+    Level 0 keeps the last `capacity` samples in a ring. Every level above keeps `capacity` buckets
+    of `factor` buckets of the level below, with min, max and mean per channel; min/max keeps
+    spikes and pauses visible however coarse the level. With the defaults (1024 buckets, factor 4,
+    6 levels) the top level spans 1024 * 4**5 samples, over 290 hours at 1 Hz, in under 0.5 MB.
+    append() is amortized O(1). window() returns the finest level that covers the requested span
+    in at most `points` buckets, so a chart costs the same after 10 minutes as after 5 hours.
+    Raises ImportError without NumPy.
+    """
+
+    def __init__(self, capacity=1024, factor=4, levels=6, channels=len(CHANNELS)):
+        if np is None:
+            raise ImportError("SessionSeries needs numpy")
+        self.capacity = capacity
+        self.factor = factor
+        self.levels = levels
+        # per level ring: time of the bucket's first sample, min, max and mean per channel
+        self.time = np.zeros((levels, capacity))
+        self.low = np.zeros((levels, capacity, channels))
+        self.high = np.zeros((levels, capacity, channels))
+        self.mean = np.zeros((levels, capacity, channels))
+        self.heads = [0] * levels  # next slot per level
+        self.counts = [0] * levels  # filled slots per level
+        # bucket being built per level (index 0 unused): buckets of the level below taken so far
+        self.partial_time = [0.0] * levels
+        self.partial_low = np.zeros((levels, channels))
+        self.partial_high = np.zeros((levels, channels))
+        self.partial_sum = np.zeros((levels, channels))
+        self.partial_count = [0] * levels
+        self.samples = 0
+        self.last_time = None
+
+    def append(self, t, values):
+        # one sample at t s with a value per channel
+        self.samples += 1
+        self.last_time = t
+        self.store(0, t, values, values, values)
+
+    def store(self, level, t, low, high, mean):
+        head = self.heads[level]
+        self.time[level, head] = t
+        self.low[level, head] = low
+        self.high[level, head] = high
+        self.mean[level, head] = mean
+        self.heads[level] = (head + 1) % self.capacity
+        if self.counts[level] < self.capacity:
+            self.counts[level] += 1
+        up = level + 1
+        if up == self.levels:
+            return
+        if self.partial_count[up] == 0:
+            self.partial_time[up] = t
+            self.partial_low[up] = low
+            self.partial_high[up] = high
+            self.partial_sum[up] = mean
+        else:
+            np.minimum(self.partial_low[up], low, out=self.partial_low[up])
+            np.maximum(self.partial_high[up], high, out=self.partial_high[up])
+            self.partial_sum[up] += mean
+        self.partial_count[up] += 1
+        if self.partial_count[up] == self.factor:
+            self.partial_count[up] = 0
+            self.store(up, t=self.partial_time[up], low=self.partial_low[up], high=self.partial_high[up],
+                       mean=self.partial_sum[up] / self.factor)
+
+    def select(self, span, points):
+        # finest level holding the span (or the whole session) in at most `points` buckets
+        start = None if span is None else self.last_time - span
+        for level in range(self.levels):
+            count = self.counts[level]
+            if count < self.capacity:
+                oldest = self.time[level, 0]  # never wrapped: everything since the first sample
+                complete = True
+            else:
+                oldest = self.time[level, self.heads[level]]
+                complete = start is not None and oldest <= start
+            if complete:
+                first = oldest if start is None else max(oldest, start)
+                # buckets of this level in the span, from its share of the level's time range
+                newest = self.time[level, self.heads[level] - 1]
+                buckets = count if newest <= oldest else count * (self.last_time - first) / (newest - oldest)
+                if points is None or buckets <= points:
+                    return level
+        return self.levels - 1
+
+    def window(self, channel, span=None, points=None):
+        """(time, low, high, mean) arrays of one channel, oldest first, for the last `span` s.
+
+        span None = the whole session (as far as the top level reaches). The tail not yet in a
+        complete bucket of the chosen level is appended as one partial bucket per level below.
+        """
+        if not self.samples:
+            empty = np.zeros(0)
+            return empty, empty, empty, empty
+        level = self.select(span, points)
+        count = self.counts[level]
+        head = self.heads[level]
+        order = np.arange(count) if count < self.capacity else np.r_[head:count, 0:head]
+        arrays = [self.time[level, order], self.low[level, order, channel],
+                  self.high[level, order, channel], self.mean[level, order, channel]]
+        tail = [up for up in range(level, 0, -1) if self.partial_count[up]]
+        if tail:
+            arrays = [np.concatenate((arrays[0], [self.partial_time[up] for up in tail])),
+                      np.concatenate((arrays[1], [self.partial_low[up, channel] for up in tail])),
+                      np.concatenate((arrays[2], [self.partial_high[up, channel] for up in tail])),
+                      np.concatenate((arrays[3], [self.partial_sum[up, channel] / self.partial_count[up]
+                                                  for up in tail]))]
+        if span is not None:
+            first = np.searchsorted(arrays[0], self.last_time - span)
+            arrays = [array[first:] for array in arrays]
+        return tuple(arrays)
+
+    def memory(self):
+        # bytes held by the rings, fixed at construction
+        return sum(array.nbytes for array in (self.time, self.low, self.high, self.mean))
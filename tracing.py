@@ -0,0 +1,94 @@
+import time
+
+# End-to-end latency tracing of treadmill samples.
+# Every treadmill data notification gets a trace, (trace id, arrival ns), when it arrives; each
+# later stage records the time since that arrival once per trace id. The trace travels with the
+# sample where a stage runs later or on another thread (the notification buffer, the bus signal,
+# the ANT state snapshot), so a newer arrival does not take over an older sample's latency. Components hold `tracer = None` unless
+# tracing is on, so a disabled tracer costs one attribute check per hook.
+
+ARRIVAL = 0  # BleCentral.update_ftms_value (or the simulated treadmill / replay)
+GUI = 1  # signal hop to TreadmillGUI.ftms_td
+ANT_STATE = 2  # AntSend.update_state
+ANT_BROADCAST = 3  # next send_broadcast_data of a stride page 1 carrying the sample
+BLE_NOTIFY = 4  # FtmsPeripheral writeCharacteristic
+STAGE_NAMES = ("arrival", "gui", "ant state", "ant broadcast", "ble notify")
+
+SUB_BITS = 4
+SUB = 1 << SUB_BITS  # linear sub-buckets per power of two, <= 6 % error
+BUCKETS = SUB + 32 * SUB
+
+
+class LatencyHistogram:
+    """Fixed-size log-linear histogram of latencies in microseconds."""
+    __slots__ = ('counts', 'count', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.max = 0
+
+    def record(self, us):
+        if us < SUB:
+            index = us if us > 0 else 0
+        else:
+            shift = us.bit_length() - SUB_BITS - 1
+            index = SUB + shift * SUB + (us >> shift) - SUB
+            if index >= BUCKETS:
+                index = BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        if us > self.max:
+            self.max = us
+
+    @staticmethod
+    def bucket_value(index):
+        # middle of the bucket in microseconds
+        if index < SUB:
+            return index
+        shift, top = divmod(index - SUB, SUB)
+        top += SUB
+        return ((top << shift) + ((top + 1) << shift)) / 2
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+
+class Tracer:
+    def __init__(self):
+        # (trace id, arrival ns) of the newest sample, replaced as one tuple so another thread never
+        # reads the id of one sample with the arrival of the next
+        self.last = (0, 0)
+        self.stamped = [0] * len(STAGE_NAMES)  # trace id each stage was last recorded for
+        self.histograms = [LatencyHistogram() for _ in STAGE_NAMES]
+
+    def arrived(self):
+        trace = (self.last[0] + 1, time.monotonic_ns())
+        self.last = trace
+        self.stamped[ARRIVAL] = trace[0]
+        self.histograms[ARRIVAL].record(0)
+        return trace
+
+    def stamp(self, stage, trace=None):
+        # trace None = the newest sample, for stages that run right after its arrival on its thread
+        trace_id, arrival = self.last if trace is None else trace
+        if self.stamped[stage] == trace_id or not trace_id:
+            return
+        self.stamped[stage] = trace_id
+        self.histograms[stage].record((time.monotonic_ns() - arrival) // 1000)
+
+    def dump(self):
+        lines = [f"Latency since arrival, {self.last[0]} samples traced (ms: p50 / p95 / p99 / max)"]
+        for name, histogram in zip(STAGE_NAMES[1:], self.histograms[1:]):
+            lines.append(f"{name:14s} n={histogram.count:6d}  "
+                         f"{histogram.percentile(50) / 1000:8.2f} / {histogram.percentile(95) / 1000:8.2f} / "
+                         f"{histogram.percentile(99) / 1000:8.2f} / {histogram.max / 1000:8.2f}")
+        return "\n".join(lines)
@@ -0,0 +1,29 @@
+from abc import ABC, abstractmethod
+
+
+class TreadmillBackend(ABC):
+    """Interface of the treadmill side of the bridge.
+
+    A backend publishes what a FTMS treadmill notifies on the event bus (treadmill_data, status,
+    training_status, connection_state "central" and log) and takes control point commands through
+    update_ftms(). `commands` is the ControlPointQueue the commands are paced through. With a
+    `tracer` every published treadmill data sample starts a latency trace. A backend missing one of
+    the abstract methods cannot be instantiated.
+    """
+
+    def __init__(self, bus, tracer=None):
+        self.bus = bus
+        self.tracer = tracer
+        self.commands = None
+
+    @abstractmethod
+    def run(self):
+        pass
+
+    @abstractmethod
+    def update_ftms(self, value, pace=None):
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
@@ -0,0 +1,206 @@
+import json
+import time
+
+from PySide6.QtCore import QObject, QTimer, Qt, Signal
+
+from ftms_data import decode_treadmill_data, TreadmillData
+
+# FTMS control point op codes
+REQUEST_CONTROL = 0x00
+SET_SPEED = 0x02  # uint16, 0.01 km/h
+SET_INCLINE = 0x03  # sint16, 0.1 %
+START = 0x07
+STOP_OR_PAUSE = 0x08
+
+# FTMS status (0x2ADA) op code acknowledging a new target speed
+STATUS_TARGET_SPEED = 0x05
+
+
+def load_workout(path):
+    """Segments of a workout file as (duration s, distance m, speed km/h, incline %) tuples.
+
+    The file is JSON: {"name": "5 x 400 m", "segments": [{"duration": 300, "speed": 8.0},
+    {"distance": 400, "speed": 14.0, "incline": 1.0}, ...]}. Every segment has either a duration
+    or a distance, the other one is None in the tuple; incline defaults to 0.
+    Raises OSError if the file cannot be read and ValueError if it is not a workout.
+    """
+    with open(path, encoding="utf-8") as file:
+        workout = json.load(file)
+    segments = []
+    for number, segment in enumerate(workout.get("segments", ()) if isinstance(workout, dict) else (), 1):
+        try:
+            duration = segment.get("duration")
+            distance = segment.get("distance")
+            speed = float(segment["speed"])
+            incline = float(segment.get("incline", 0.0))
+            if (duration is None) == (distance is None):
+                raise ValueError("needs either a duration or a distance")
+            length = float(duration if duration is not None else distance)
+            if length <= 0 or not 0 <= speed <= 655:
+                raise ValueError("out of range")
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{path}: segment {number}: {e}") from None
+        segments.append((length if duration is not None else None,
+                         length if distance is not None else None, speed, incline))
+    if not segments:
+        raise ValueError(f"{path}: no segments")
+    return segments
+
+
+class WorkoutExecutor(QObject):
+    """Runs a workout's segments on the treadmill through the control point.
+
+    Every transition has a target time on the monotonic clock: the workout start plus the durations
+    so far, or, for a distance segment, the moment the treadmill's distance reaches the segment's
+    end, predicted from the current speed and refined on every notification. Targets chain from
+    target to target, so a late transition does not shift the ones after it. A precise single-shot
+    timer writes the next speed and incline `lead` ms ahead of the target, lead being the measured
+    command latency: write to the treadmill's target speed status (0x2ADA op 0x05), smoothed with
+    `smoothing`. A write the treadmill does not acknowledge within `ack_timeout` ms has no achieved
+    time and is left out of the error statistics. `write(value, pace=None)` queues a control point command, e.g. BleCentral.update_ftms.
+    """
+    segment_started = Signal(int)
+    finished = Signal()
+
+    def __init__(self, segments, write, bus, initial_latency=150.0, smoothing=0.2, ack_timeout=2000, parent=None):
+        super(WorkoutExecutor, self).__init__(parent)
+        self.segments = segments
+        self.write = write
+        self.bus = bus
+        self.lead = initial_latency  # ms
+        self.smoothing = smoothing
+        self.ack_timeout = ack_timeout
+
+        self.index = -1  # segment running
+        self.start_time = None  # ns, monotonic
+        self.target = None  # ns, next transition, None = not predictable yet (belt stopped)
+        self.end_distance = None  # m, end of the running distance segment
+        self.values = TreadmillData()
+        self.distance = None  # m, last treadmill distance
+        self.pending = None  # result waiting for the treadmill's acknowledgment
+        self.running = False
+
+        # per segment: target and achieved time in ns, latency and error in ms (None if not
+        # acknowledged), acknowledged
+        self.results = []
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.transition)
+        self.ack_timer = QTimer(self)
+        self.ack_timer.setSingleShot(True)
+        self.ack_timer.timeout.connect(self.ack_missed)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.bus.status.connect(self.status)
+        self.bus.treadmill_data.connect(self.treadmill_data)
+        self.write(bytes([REQUEST_CONTROL]))
+        self.write(bytes([START]))
+        self.start_time = self.target = time.monotonic_ns()
+        self.arm()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.timer.stop()
+        self.ack_timer.stop()
+        self.bus.status.disconnect(self.status)
+        self.bus.treadmill_data.disconnect(self.treadmill_data)
+
+    def arm(self):
+        if self.target is None:
+            self.timer.stop()
+            return
+        delay = (self.target - time.monotonic_ns()) / 1e6 - self.lead
+        self.timer.start(max(0, int(delay)))
+
+    def transition(self):
+        target = self.target
+        self.index += 1
+        if self.index == len(self.segments):
+            self.write(bytes([STOP_OR_PAUSE, 0x02]))
+            self.stop()
+            self.finished.emit()
+            return
+        duration, distance, speed, incline = self.segments[self.index]
+        sent = time.monotonic_ns()
+        self.write(bytes([SET_SPEED]) + round(speed * 100).to_bytes(2, byteorder='little'))
+        self.write(bytes([SET_INCLINE]) + round(incline * 10).to_bytes(2, byteorder='little', signed=True))
+        self.ack_missed()  # the previous transition, if the treadmill never acknowledged it
+        self.pending = {"segment": self.index, "target": target, "sent": sent}
+        self.ack_timer.start(self.ack_timeout)
+        self.segment_started.emit(self.index)
+
+        if duration is not None:
+            self.end_distance = None
+            self.target = target + int(duration * 1e9)
+        else:
+            previous = self.segments[self.index - 1] if self.index else None
+            if previous is not None and previous[1] is not None and self.end_distance is not None:
+                start = self.end_distance  # chained, the lead's metres were run at the old speed
+            else:
+                start = self.distance or 0
+            self.end_distance = start + distance
+            self.predict(time.monotonic_ns())
+        self.arm()
+
+    def predict(self, now):
+        # target of the running distance segment from the remaining metres at the current speed
+        remaining = self.end_distance - (self.distance or 0)
+        speed = self.values.speed / 360  # m/s
+        if remaining <= 0:
+            self.target = now
+        elif speed > 0:
+            self.target = now + int(remaining / speed * 1e9)
+        else:
+            self.target = None
+
+    def treadmill_data(self, data, trace=None):
+        try:
+            decode_treadmill_data(data, self.values)
+        except ValueError:
+            return
+        self.distance = self.values.total_distance
+        if self.end_distance is not None and self.index < len(self.segments):
+            self.predict(time.monotonic_ns())
+            self.arm()
+
+    def status(self, data):
+        if self.pending is not None and data and data[0] == STATUS_TARGET_SPEED:
+            self.acknowledged(time.monotonic_ns(), True)
+
+    def ack_missed(self):
+        if self.pending is not None:
+            self.acknowledged(None, False)
+
+    def acknowledged(self, achieved, acknowledged):
+        result, self.pending = self.pending, None
+        self.ack_timer.stop()
+        result["achieved"] = achieved
+        result["latency_ms"] = result["error_ms"] = None
+        result["acknowledged"] = acknowledged
+        if acknowledged:
+            result["latency_ms"] = (achieved - result["sent"]) / 1e6
+            result["error_ms"] = (achieved - result["target"]) / 1e6
+            self.lead += self.smoothing * (result["latency_ms"] - self.lead)
+        self.results.append(result)
+
+    def report(self):
+        lines = []
+        for result in self.results:
+            line = f"segment {result['segment'] + 1}: target {(result['target'] - self.start_time) / 1e9:.3f} s, "
+            if result["acknowledged"]:
+                line += f"error {result['error_ms']:+.0f} ms, latency {result['latency_ms']:.0f} ms"
+            else:
+                line += "not acknowledged"
+            lines.append(line)
+        errors = [abs(result["error_ms"]) for result in self.results if result["acknowledged"]]
+        if errors:
+            lines.append(f"transition error mean {sum(errors) / len(errors):.0f} ms, max {max(errors):.0f} ms, "
+                         f"lead {self.lead:.0f} ms")
+        return "\n".join(lines)